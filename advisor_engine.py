@@ -0,0 +1,804 @@
+"""
+Headless EV advisor engine.
+
+Everything the Smart EV Match Finder computes, without Streamlit: scoring
+features, hard-constraint filtering, weighted ranking, diverse alternatives
+and the price/range/year frontier. ``AdvisorEngine`` takes an ``AdvisorProfile`` and
+returns a ``Recommendation``; the Streamlit UI in ``improved_ev_advisor``
+only renders it, and the same engine serves batch jobs, benchmarks and a
+small JSON endpoint:
+
+    python advisor_engine.py bench --profiles 5000
+    python advisor_engine.py serve --port 8765
+
+    curl -X POST localhost:8765/recommend \\
+        -d '{"use_case": "Regular road trips (> 200 mi)", "budget_choice": "Mid-range ($40k - $60k)"}'
+"""
+
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass, fields
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from sklearn.neighbors import KDTree
+
+from pareto_frontier import pareto_frontier
+from result_cache import LRUCache, dataset_fingerprint, freeze
+from vehicle_search import ConstraintIndex
+
+TOP_K = 10
+RESULT_CACHE_SIZE = 256
+# Per-engine caches for constraint buckets (candidates, frontier) and sensitivity sweeps
+CANDIDATE_CACHE_SIZE = 64
+SENSITIVITY_CACHE_SIZE = 64
+# Catalog sizes the benchmark scales the variant table to
+BENCHMARK_VARIANT_COUNTS = (1_000, 5_000, 20_000)
+CAFV_COLUMN = 'Clean Alternative Fuel Vehicle (CAFV) Eligibility'
+CAFV_BONUS_WEIGHT = 0.1
+
+# Weight vectors are ordered as SCORE_COMPONENTS and applied to FEATURE_COLUMNS
+SCORE_COMPONENTS = ('price', 'range', 'value', 'newness', 'cafv')
+FEATURE_COLUMNS = ('price_score', 'range_score', 'value_score', 'newness_score', 'cafv_eligible')
+
+# Research-based default weights for Quick Match
+USE_CASE_WEIGHTS = {
+    "Daily commuting (< 50 mi/day)": {'price': 0.45, 'range': 0.20, 'value': 0.25, 'newness': 0.10},
+    "Regular road trips (> 200 mi)": {'price': 0.25, 'range': 0.50, 'value': 0.15, 'newness': 0.10},
+    "Family hauling & errands": {'price': 0.35, 'range': 0.30, 'value': 0.25, 'newness': 0.10},
+    "Weekend fun & performance": {'price': 0.30, 'range': 0.30, 'value': 0.15, 'newness': 0.25},
+    "General purpose / Not sure": {'price': 0.35, 'range': 0.30, 'value': 0.25, 'newness': 0.10}
+}
+
+# Detailed-profile priority labels and the score component each one raises
+PRIORITY_COMPONENTS = {
+    "Lowest price": 'price',
+    "Longest range": 'range',
+    "Brand reputation": 'newness',  # Proxy: newer models from better brands
+    "Latest technology": 'newness',
+    "Best value (range/price)": 'value'
+}
+PROFILE_METHODS = ('quick', 'detailed')
+CAFV_PREFERENCES = ("Don't care", "Must be CAFV eligible", "Prefer CAFV eligible")
+
+# Alternative strategies: column each make is ranked on, and whether larger is better
+LEADER_COLUMNS = (('Base MSRP', False), ('Electric Range', True), ('value_score', True))
+
+# Weight-sensitivity sweep: simplex grid spacing and the "nearby weightings" radius (L1)
+SENSITIVITY_STEP = 0.05
+SENSITIVITY_RADIUS = 0.2
+
+# "Similar vehicles": normalized features and how much each counts in the distance
+SIMILAR_K = 5
+SIMILARITY_FEATURES = ('Electric Range_norm', 'Base MSRP_norm', 'Model Year_norm', 'is_bev', 'cafv_eligible')
+SIMILARITY_WEIGHTS = (1.0, 1.0, 0.6, 0.5, 0.3)
+
+BUDGET_RANGES = {
+    "Budget-conscious (< $40k)": (0, 40000),
+    "Mid-range ($40k - $60k)": (40000, 60000),
+    "Premium ($60k - $80k)": (60000, 80000),
+    "Luxury (> $80k)": (80000, 999999),
+    "No preference": (0, 999999)
+}
+
+RANGE_NEEDS = (
+    "Not critical (city driving)",
+    "Moderate (occasional trips)",
+    "Important (regular highway)",
+    "Essential (frequent road trips)"
+)
+
+# Minimum electric range in miles per use case and range need
+RANGE_REQUIREMENTS = {
+    "Daily commuting (< 50 mi/day)": dict(zip(RANGE_NEEDS, (100, 150, 200, 250))),
+    "Regular road trips (> 200 mi)": dict(zip(RANGE_NEEDS, (200, 250, 300, 350))),
+    "Family hauling & errands": dict(zip(RANGE_NEEDS, (120, 180, 240, 280))),
+    "Weekend fun & performance": dict(zip(RANGE_NEEDS, (150, 200, 250, 300))),
+    "General purpose / Not sure": dict(zip(RANGE_NEEDS, (120, 180, 220, 260)))
+}
+
+
+def compute_scoring_features(variants):
+    """
+    Add normalized 0-1 component scores used by the recommendation ranking.
+    
+    Normalization spans the whole variant table, so scores are comparable
+    across every filter combination and only need computing once per dataset.
+    """
+    features = variants.copy()
+    
+    for col in ['Electric Range', 'Base MSRP', 'Model Year']:
+        if col in features.columns:
+            col_series = features[col].dropna()
+            if not col_series.empty and col_series.min() != col_series.max():
+                features[f'{col}_norm'] = (features[col] - col_series.min()) / (col_series.max() - col_series.min())
+            else:
+                features[f'{col}_norm'] = 0.5
+        else:
+            features[f'{col}_norm'] = 0.5
+    
+    features['range_score'] = features['Electric Range_norm']
+    features['price_score'] = 1 - features['Base MSRP_norm']  # Lower price = higher score
+    features['newness_score'] = features['Model Year_norm']
+    
+    # Value score (range per dollar)
+    if 'Electric Range' in features.columns and 'Base MSRP' in features.columns:
+        value_raw = features['Electric Range'] / (features['Base MSRP'] + 1)
+        if value_raw.max() > value_raw.min():
+            features['value_score'] = (value_raw - value_raw.min()) / (value_raw.max() - value_raw.min())
+        else:
+            features['value_score'] = 0.5
+    else:
+        features['value_score'] = 0.5
+    
+    if CAFV_COLUMN in features.columns:
+        features['cafv_eligible'] = features[CAFV_COLUMN].astype(str).str.contains("eligible", case=False, na=False).astype(float)
+    else:
+        features['cafv_eligible'] = 0.0
+    
+    return features
+
+
+def profile_weights(method="quick", use_case=None, priorities=None):
+    """Scoring weights for a Quick Match use case or a ranked priority list."""
+    if method == "quick":
+        # Research-based default weights
+        return USE_CASE_WEIGHTS[use_case]
+    
+    if not priorities:
+        return {'price': 0.35, 'range': 0.30, 'value': 0.25, 'newness': 0.10}
+    
+    # Custom weights based on stated priorities
+    p1, p2, p3 = priorities
+    
+    # Priority 1 gets 50%, Priority 2 gets 30%, Priority 3 gets 20%
+    weights = {'price': 0, 'range': 0, 'value': 0, 'newness': 0}
+    weights[PRIORITY_COMPONENTS.get(p1, 'value')] += 0.50
+    weights[PRIORITY_COMPONENTS.get(p2, 'price')] += 0.30
+    weights[PRIORITY_COMPONENTS.get(p3, 'range')] += 0.20
+    return weights
+
+
+def weight_vector(weights, cafv_pref=None):
+    """Turn a weights dict into a vector aligned with ``SCORE_COMPONENTS``."""
+    vector = np.array([weights.get(component, 0.0) for component in SCORE_COMPONENTS], dtype=float)
+    if cafv_pref == "Prefer CAFV eligible":
+        vector[SCORE_COMPONENTS.index('cafv')] = CAFV_BONUS_WEIGHT
+    return vector
+
+
+def feature_matrix(features):
+    """Component scores as an ``(n_variants, n_components)`` array."""
+    return features[list(FEATURE_COLUMNS)].to_numpy(dtype=float)
+
+
+def score_profiles(weight_matrix, features, k=TOP_K, block_size=1024):
+    """
+    Score every variant for many user profiles at once.
+    
+    ``weight_matrix`` is ``(n_profiles, n_components)`` in ``SCORE_COMPONENTS``
+    order and ``features`` is ``(n_variants, n_components)``. Each block of
+    profiles is one matrix multiply followed by a column-wise partial
+    selection. Returns ``(positions, scores)``, both ``(n_profiles, k)``,
+    best first; positions index rows of ``features``.
+    """
+    weight_matrix = np.atleast_2d(np.asarray(weight_matrix, dtype=float))
+    features = np.asarray(features, dtype=float)
+    n_variants = features.shape[0]
+    k = min(k, n_variants)
+    positions = np.empty((weight_matrix.shape[0], k), dtype=int)
+    scores = np.empty((weight_matrix.shape[0], k), dtype=float)
+    if k == 0:
+        return positions, scores
+    
+    for start in range(0, weight_matrix.shape[0], block_size):
+        block = weight_matrix[start:start + block_size]
+        block_scores = features @ block.T  # (n_variants, profiles)
+        block_scores = np.where(np.isnan(block_scores), -np.inf, block_scores)
+        candidates = np.argpartition(-block_scores, k - 1, axis=0)[:k]
+        candidate_scores = np.take_along_axis(block_scores, candidates, axis=0)
+        order = np.argsort(-candidate_scores, axis=0, kind='stable')
+        positions[start:start + block_size] = np.take_along_axis(candidates, order, axis=0).T
+        scores[start:start + block_size] = np.take_along_axis(candidate_scores, order, axis=0).T
+    return positions, scores
+
+
+def recommend_for_profiles(features, weight_matrix, profile_names=None, k=TOP_K):
+    """Top-``k`` variants per profile as a long table (profile, rank, variant columns, score)."""
+    positions, scores = score_profiles(weight_matrix, feature_matrix(features), k)
+    if profile_names is None:
+        profile_names = range(len(positions))
+    display_cols = [c for c in ['Make', 'Model', 'Model Year', 'Electric Range', 'Base MSRP', 'Electric Vehicle Type'] if c in features.columns]
+    frames = []
+    for name, row_positions, row_scores in zip(profile_names, positions, scores):
+        frames.append(
+            features.iloc[row_positions][display_cols]
+            .assign(profile=name, rank=np.arange(1, len(row_positions) + 1), composite_score=row_scores)
+        )
+    if not frames:
+        return pd.DataFrame(columns=['profile', 'rank'] + display_cols + ['composite_score'])
+    result = pd.concat(frames)
+    return result[['profile', 'rank'] + display_cols + ['composite_score']].reset_index(names='variant_id')
+
+
+def use_case_recommendations(features, k=TOP_K):
+    """Precompute the Quick Match top-``k`` for every use case."""
+    weight_matrix = np.vstack([weight_vector(weights) for weights in USE_CASE_WEIGHTS.values()])
+    return recommend_for_profiles(features, weight_matrix, list(USE_CASE_WEIGHTS), k)
+
+
+def simulate_profiles(n_profiles, seed=42, cafv_share=0.3):
+    """Random user weight vectors for analytics: Dirichlet weights plus an optional CAFV bonus."""
+    rng = np.random.default_rng(seed)
+    weights = np.zeros((n_profiles, len(SCORE_COMPONENTS)))
+    weights[:, :4] = rng.dirichlet(np.ones(4), n_profiles)
+    weights[:, 4] = np.where(rng.random(n_profiles) < cafv_share, CAFV_BONUS_WEIGHT, 0.0)
+    return weights
+
+
+def weight_grid(step=SENSITIVITY_STEP, n_components=4):
+    """Every weight vector on the simplex with spacing ``step`` (rows sum to 1)."""
+    units = int(round(1 / step))
+    grid = np.indices((units + 1,) * (n_components - 1)).reshape(n_components - 1, -1).T
+    grid = grid[grid.sum(axis=1) <= units]
+    return np.column_stack([grid, units - grid.sum(axis=1)]) / units
+
+
+def weight_sensitivity(features, weights, cafv_pref=None, step=SENSITIVITY_STEP, radius=SENSITIVITY_RADIUS):
+    """
+    Which variant wins across the whole space of price/range/value/newness weights.
+    
+    Scores every candidate under every grid weighting in a single matrix
+    multiply. Returns the winners with ``win_share`` (fraction of all
+    weightings they top) and ``nearby_share`` (fraction of weightings within
+    ``radius`` L1 of ``weights``), best first. The profile's CAFV bonus is
+    held fixed.
+    """
+    grid = weight_grid(step)
+    profile = weight_vector(weights, cafv_pref)
+    weight_matrix = np.column_stack([grid, np.full(len(grid), profile[4])])
+    winners, _ = score_profiles(weight_matrix, feature_matrix(features), k=1, block_size=len(grid))
+    winners = winners[:, 0]
+    
+    nearby = np.abs(grid - profile[:4]).sum(axis=1) <= radius + 1e-9
+    counts = np.bincount(winners, minlength=len(features))
+    nearby_counts = np.bincount(winners[nearby], minlength=len(features))
+    won = np.flatnonzero(counts)
+    result = features.iloc[won].assign(
+        win_share=counts[won] / len(grid),
+        nearby_share=nearby_counts[won] / max(nearby.sum(), 1)
+    )
+    return result.sort_values(['win_share', 'nearby_share'], ascending=False)
+
+
+def similarity_matrix(features):
+    """Weighted, normalized feature vectors for nearest-neighbor search."""
+    columns = {
+        name: features[name] for name in SIMILARITY_FEATURES if name in features.columns
+    }
+    if 'Electric Vehicle Type' in features.columns:
+        columns['is_bev'] = features['Electric Vehicle Type'].astype(str).str.contains("BEV", na=False).astype(float)
+    matrix = pd.DataFrame(columns, index=features.index).reindex(columns=list(SIMILARITY_FEATURES), fill_value=0.0)
+    # Missing prices/ranges/years sit at the middle of the scale
+    return matrix.fillna(0.5).to_numpy(dtype=float) * np.array(SIMILARITY_WEIGHTS)
+
+
+@dataclass(frozen=True)
+class AdvisorProfile:
+    """A buyer's answers: hard constraints plus how to weigh what remains."""
+    
+    use_case: str = "General purpose / Not sure"
+    budget: Tuple[float, float] = (0, 999999)
+    min_range: float = 0
+    method: str = "quick"
+    priorities: Optional[Tuple[str, str, str]] = None
+    ev_type: Optional[str] = None
+    makes: Tuple[str, ...] = ()
+    min_year: Optional[int] = None
+    cafv_pref: Optional[str] = None
+    
+    @classmethod
+    def from_answers(cls, use_case, budget_choice="No preference", range_need="Moderate (occasional trips)", **kwargs):
+        """Build a profile from the advisor form's labels."""
+        return cls(
+            use_case=use_case,
+            budget=BUDGET_RANGES[budget_choice],
+            min_range=RANGE_REQUIREMENTS[use_case][range_need],
+            **kwargs
+        )
+    
+    def validate(self):
+        """Raise ``ValueError`` for answers the engine cannot score; returns the profile."""
+        def number(name, value):
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not np.isfinite(value):
+                raise ValueError(f"{name} must be a number, got {value!r}")
+        
+        if self.method not in PROFILE_METHODS:
+            raise ValueError(f"method must be one of {', '.join(PROFILE_METHODS)}")
+        if self.method == 'quick' and self.use_case not in USE_CASE_WEIGHTS:
+            raise ValueError(f"unknown use_case: {self.use_case!r}")
+        if self.priorities is not None:
+            if len(self.priorities) != 3 or any(p not in PRIORITY_COMPONENTS for p in self.priorities):
+                raise ValueError(f"priorities must be three of: {', '.join(PRIORITY_COMPONENTS)}")
+        if len(self.budget) != 2:
+            raise ValueError("budget must be [low, high]")
+        for bound in self.budget:
+            number('budget', bound)
+        number('min_range', self.min_range)
+        if self.min_year is not None:
+            number('min_year', self.min_year)
+        if self.ev_type is not None and not isinstance(self.ev_type, str):
+            raise ValueError("ev_type must be a string")
+        if not all(isinstance(make, str) for make in self.makes):
+            raise ValueError("makes must be a list of strings")
+        if self.cafv_pref is not None and self.cafv_pref not in CAFV_PREFERENCES:
+            raise ValueError(f"cafv_pref must be one of: {', '.join(CAFV_PREFERENCES)}")
+        return self
+    
+    def weights(self):
+        return profile_weights(self.method, self.use_case, self.priorities)
+    
+    def constraints(self):
+        """``(between, isin)`` arguments for ``ConstraintIndex.select``."""
+        between = {
+            'Base MSRP': tuple(self.budget),
+            'Electric Range': (self.min_range, None)
+        }
+        if self.min_year is not None:
+            between['Model Year'] = (self.min_year, None)
+        
+        isin = {}
+        if self.ev_type:
+            isin['Electric Vehicle Type'] = [self.ev_type]
+        if self.makes:
+            isin['Make'] = list(self.makes)
+        if self.cafv_pref == "Must be CAFV eligible":
+            isin['cafv_eligible'] = [1.0]
+        return between, isin
+
+
+@dataclass
+class Recommendation:
+    """Top matches best first, (title, vehicle, highlight) alternatives and look-alikes of the top match."""
+    
+    ranked: pd.DataFrame
+    alternatives: list
+    weights: dict
+    similar: Optional[pd.DataFrame] = None
+    
+    @property
+    def empty(self):
+        return self.ranked.empty
+
+
+class AdvisorEngine:
+    """
+    Recommend variants for advisor profiles over one variant table.
+    
+    Recommendations are cached per (constraints, weight vector) in ``cache``;
+    pass a shared ``LRUCache`` to pool them between engines or sessions.
+    Candidate sets, frontiers and sensitivity sweeps each get their own
+    per-engine cache, so large entries cannot evict recommendations and each
+    cache's hit rate measures one kind of reuse.
+    """
+    
+    def __init__(self, variants, cache=None, top_k=TOP_K):
+        self.features = variants if 'price_score' in variants.columns else compute_scoring_features(variants)
+        self.top_k = top_k
+        self.fingerprint = dataset_fingerprint(self.features)
+        self.constraint_index = ConstraintIndex(self.features)
+        self._feature_matrix = feature_matrix(self.features)
+        self.similarity_index = KDTree(similarity_matrix(self.features)) if len(self.features) else None
+        model_columns = [c for c in ('Make', 'Model') if c in self.features.columns]
+        self._model_codes = (
+            self.features.groupby(model_columns, observed=True, dropna=False, sort=False).ngroup().to_numpy()
+            if model_columns
+            else np.arange(len(self.features))
+        )
+        self.cache = cache if cache is not None else LRUCache(RESULT_CACHE_SIZE)
+        self.candidate_cache = LRUCache(CANDIDATE_CACHE_SIZE)
+        self.frontier_cache = LRUCache(CANDIDATE_CACHE_SIZE)
+        self.sensitivity_cache = LRUCache(SENSITIVITY_CACHE_SIZE)
+    
+    @classmethod
+    def from_registrations(cls, df, **kwargs):
+        """Engine over the variants of a registration-level frame."""
+        from data_utils import build_vehicle_variants
+        
+        return cls(build_vehicle_variants(df), **kwargs)
+    
+    def candidates(self, between=None, isin=None):
+        """
+        Return ``(candidates, features, leaders)`` for one hard-constraint bucket.
+        
+        ``features`` is the candidates' ``feature_matrix`` and ``leaders`` are
+        the per-make leaders the alternatives are drawn from.
+        """
+        key = ('candidates', self.fingerprint, freeze(between or {}), freeze(isin or {}))
+        
+        def compute():
+            positions = self.constraint_index.select(between=between, isin=isin)
+            candidates = self.features.iloc[positions]
+            return candidates, self._feature_matrix[positions], make_leader_table(candidates)
+        
+        return self.candidate_cache.get_or_compute(key, compute)
+    
+    def frontier(self, profile: AdvisorProfile) -> pd.DataFrame:
+        """Price/range/year frontier of the variants satisfying ``profile``, cheapest first."""
+        between, isin = profile.constraints()
+        key = ('frontier', self.fingerprint, freeze(between), freeze(isin))
+        
+        def compute():
+            candidates, _, _ = self.candidates(between, isin)
+            return pareto_frontier(candidates)
+        
+        return self.frontier_cache.get_or_compute(key, compute)
+    
+    def recommend(self, profile: AdvisorProfile) -> Recommendation:
+        """Rank the variants satisfying ``profile`` and pick diverse alternatives."""
+        weights = profile.weights()
+        vector = weight_vector(weights, profile.cafv_pref)
+        between, isin = profile.constraints()
+        key = (self.fingerprint, self.top_k, freeze(between), freeze(isin), tuple(np.round(vector, 6)))
+        
+        def compute():
+            candidates, matrix, leaders = self.candidates(between, isin)
+            if candidates.empty:
+                return Recommendation(candidates, [], weights)
+            top_positions, top_scores = score_profiles(vector[None, :], matrix, self.top_k)
+            ranked = candidates.iloc[top_positions[0]].assign(composite_score=top_scores[0])
+            alternatives = get_diverse_alternatives(candidates, ranked.iloc[0], leaders)
+            similar = self.similar(ranked.index[0])
+            return Recommendation(ranked, alternatives, weights, similar)
+        
+        return self.cache.get_or_compute(key, compute)
+    
+    def sensitivity(self, profile: AdvisorProfile, step=SENSITIVITY_STEP):
+        """``weight_sensitivity`` over the candidates satisfying ``profile``, cached."""
+        between, isin = profile.constraints()
+        key = ('sensitivity', self.fingerprint, step, freeze(between), freeze(isin),
+               freeze(profile.weights()), profile.cafv_pref)
+        
+        def compute():
+            candidates, _, _ = self.candidates(between, isin)
+            return weight_sensitivity(candidates, profile.weights(), profile.cafv_pref, step)
+        
+        return self.sensitivity_cache.get_or_compute(key, compute)
+    
+    def similar(self, label, k=SIMILAR_K, exclude_same_model=True):
+        """
+        The ``k`` variants nearest to the one at index ``label``, closest first.
+        
+        Distances are over normalized range, price and model year plus
+        powertrain and CAFV eligibility. Each make and model appears once (its
+        nearest variant), and the queried model itself is skipped unless
+        ``exclude_same_model`` is False.
+        """
+        if self.similarity_index is None:
+            return self.features.iloc[:0].assign(distance=[])
+        position = self.features.index.get_loc(label)
+        
+        # Over-fetch, widening until de-duplicated model years still leave k vehicles
+        n_query = min(len(self.features), 4 * (k + 1))
+        while True:
+            distances, positions = self.similarity_index.query(
+                self.similarity_index.data[position:position + 1], k=n_query
+            )
+            distances, positions = distances[0], positions[0]
+            codes = self._model_codes[positions]
+            keep = positions != position
+            if exclude_same_model:
+                keep &= codes != self._model_codes[position]
+            distances, positions, codes = distances[keep], positions[keep], codes[keep]
+            # Nearest variant per make and model; query results are sorted by distance
+            _, first = np.unique(codes, return_index=True)
+            first = np.sort(first)[:k]
+            if len(first) >= k or n_query == len(self.features):
+                return self.features.iloc[positions[first]].assign(distance=distances[first])
+            n_query = min(len(self.features), 2 * n_query)
+    
+    def recommend_many(self, profiles) -> List[Recommendation]:
+        return [self.recommend(profile) for profile in profiles]
+    
+    def cache_stats(self):
+        """``LRUCache.stats`` for each kind of cached entry."""
+        return {
+            'recommendations': self.cache.stats(),
+            'candidates': self.candidate_cache.stats(),
+            'frontier': self.frontier_cache.stats(),
+            'sensitivity': self.sensitivity_cache.stats(),
+        }
+
+
+def make_leaders(ranked_df, column, largest=False, make_codes=None):
+    """
+    Each make's best row for ``column`` as ``(key, position, make)``, best first.
+    
+    ``make_codes`` is ``ranked_df['Make'].factorize()``, passed in to share it
+    between columns.
+    """
+    if column not in ranked_df.columns or 'Make' not in ranked_df.columns:
+        return []
+    values = ranked_df[column].to_numpy(dtype=float)
+    valid = np.flatnonzero(~np.isnan(values))
+    if not valid.size:
+        return []
+    codes, makes = make_codes if make_codes is not None else ranked_df['Make'].factorize()
+    codes = codes[valid]
+    keys = -values[valid] if largest else values[valid]
+    best = np.full(len(makes), np.inf)
+    np.minimum.at(best, codes, keys)
+    # Ties go to the earliest row, like idxmin
+    ties = np.flatnonzero(keys == best[codes])
+    _, first = np.unique(codes[ties], return_index=True)
+    leaders = ties[first]
+    return [(keys[i], int(valid[i]), makes[codes[i]]) for i in leaders[np.lexsort((valid[leaders], keys[leaders]))]]
+
+
+def make_leader_table(ranked_df):
+    """Per-make leaders for every alternative strategy, built once per candidate set."""
+    make_codes = ranked_df['Make'].factorize() if 'Make' in ranked_df.columns else None
+    return {
+        column: make_leaders(ranked_df, column, largest, make_codes)
+        for column, largest in LEADER_COLUMNS
+    }
+
+
+def next_leader(leaders, used_makes):
+    """Position of the best make leader not already used; None when all are taken."""
+    for _, position, make in leaders:
+        if make not in used_makes:
+            return position
+    return None
+
+
+def get_diverse_alternatives(ranked_df, top_vehicle, leaders=None):
+    """
+    Get 2-3 alternative vehicles with different value propositions and brands.
+    Ensures brand diversity and highlights different strengths.
+    
+    ``leaders`` (from ``make_leader_table``) holds only the best candidate per
+    make for each strategy, so skipping already-used brands walks a list of a
+    few dozen makes rather than rescanning ``ranked_df``.
+    """
+    leaders = leaders if leaders is not None else make_leader_table(ranked_df)
+    alternatives = []
+    used_makes = {top_vehicle.get('Make')}
+    
+    # Strategy 1: Best price from different brand
+    if 'Base MSRP' in ranked_df.columns:
+        position = next_leader(leaders['Base MSRP'], used_makes)
+        if position is not None:
+            best_price = ranked_df.iloc[position]
+            price_val = int(best_price['Base MSRP']) if pd.notna(best_price.get('Base MSRP')) else 0
+            alternatives.append((
+                "💰 Most Affordable",
+                best_price,
+                f"Best price alternative: ${price_val:,}"
+            ))
+            used_makes.add(best_price.get('Make'))
+    
+    # Strategy 2: Best range from different brand
+    if 'Electric Range' in ranked_df.columns:
+        position = next_leader(leaders['Electric Range'], used_makes)
+        if position is not None:
+            best_range = ranked_df.iloc[position]
+            range_val = int(best_range['Electric Range']) if pd.notna(best_range.get('Electric Range')) else 0
+            alternatives.append((
+                "⚡ Longest Range",
+                best_range,
+                f"Maximum range: {range_val} miles"
+            ))
+            used_makes.add(best_range.get('Make'))
+    
+    # Strategy 3: Best value (range/price) from different brand
+    if 'value_score' in ranked_df.columns:
+        position = next_leader(leaders['value_score'], used_makes)
+        if position is not None:
+            best_value = ranked_df.iloc[position]
+            if 'Electric Range' in best_value and 'Base MSRP' in best_value:
+                range_val = best_value.get('Electric Range', 0)
+                price_val = best_value.get('Base MSRP', 1)
+                value_ratio = range_val / (price_val / 1000) if price_val > 0 else 0
+                alternatives.append((
+                    "⭐ Best Value",
+                    best_value,
+                    f"{value_ratio:.1f} mi per $1k spent"
+                ))
+    
+    return alternatives[:3]
+
+
+RESPONSE_COLUMNS = ['Make', 'Model', 'Model Year', 'Electric Range', 'Base MSRP', 'Electric Vehicle Type', CAFV_COLUMN, 'Registrations']
+
+
+def profile_from_json(payload):
+    """
+    Profile from a JSON object of form labels or ``AdvisorProfile`` fields.
+    
+    Raises ``ValueError`` (or ``KeyError`` for unknown form labels) on input
+    the engine cannot score, so callers can reject it up front.
+    """
+    if not isinstance(payload, dict):
+        raise ValueError("expected a JSON object")
+    payload = dict(payload)
+    if 'budget_choice' in payload or 'range_need' in payload:
+        return AdvisorProfile.from_answers(
+            payload.pop('use_case', "General purpose / Not sure"),
+            payload.pop('budget_choice', "No preference"),
+            payload.pop('range_need', "Moderate (occasional trips)"),
+            **_profile_kwargs(payload)
+        ).validate()
+    return AdvisorProfile(**_profile_kwargs(payload)).validate()
+
+
+def _profile_kwargs(payload):
+    names = {field.name for field in fields(AdvisorProfile)}
+    unknown = set(payload) - names
+    if unknown:
+        raise ValueError(f"unknown profile fields: {', '.join(sorted(unknown))}")
+    for name in ('budget', 'priorities', 'makes'):
+        if payload.get(name) is not None:
+            if not isinstance(payload[name], (list, tuple)):
+                raise ValueError(f"{name} must be a list")
+            payload[name] = tuple(payload[name])
+    return payload
+
+
+def recommendation_to_json(recommendation, frontier=None):
+    """Plain-JSON view of a recommendation (and optionally its frontier) for HTTP or batch output."""
+    def records(frame, extra=()):
+        columns = [c for c in RESPONSE_COLUMNS + list(extra) if c in frame.columns]
+        return json.loads(frame[columns].to_json(orient='records'))
+    
+    body = {
+        'weights': recommendation.weights,
+        'ranked': records(recommendation.ranked, ['composite_score']),
+        'alternatives': [
+            {'title': title, 'highlight': highlight, 'vehicle': records(vehicle.to_frame().T)[0]}
+            for title, vehicle, highlight in recommendation.alternatives
+        ],
+        'similar': records(recommendation.similar, ['distance']) if recommendation.similar is not None else []
+    }
+    if frontier is not None:
+        body['frontier'] = records(frontier)
+    return body
+
+
+def random_profiles(n_profiles, seed=42):
+    """Quick Match answers drawn uniformly, as a stand-in for real traffic."""
+    rng = np.random.default_rng(seed)
+    use_cases = list(USE_CASE_WEIGHTS)
+    budgets = list(BUDGET_RANGES)
+    return [
+        AdvisorProfile.from_answers(
+            use_cases[rng.integers(len(use_cases))],
+            budgets[rng.integers(len(budgets))],
+            RANGE_NEEDS[rng.integers(len(RANGE_NEEDS))]
+        )
+        for _ in range(n_profiles)
+    ]
+
+
+def synthetic_variants(variants, n_variants, seed=42):
+    """
+    ``variants`` tiled to ``n_variants`` rows for benchmarking larger catalogs.
+    
+    Each copy is renamed as a new model and its range and price are jittered
+    by up to 10%, so look-alikes and make leaders behave as in a real catalog.
+    """
+    rng = np.random.default_rng(seed)
+    copies = np.arange(n_variants) // max(len(variants), 1)
+    result = variants.iloc[np.arange(n_variants) % max(len(variants), 1)].reset_index(drop=True)
+    if 'Model' in result.columns:
+        model = result['Model'].astype(str)
+        result['Model'] = model.where(copies == 0, model + ' ' + copies.astype(str))
+    for column in ('Electric Range', 'Base MSRP'):
+        if column in result.columns:
+            result[column] = result[column] * rng.uniform(0.9, 1.1, n_variants)
+    return compute_scoring_features(result)
+
+
+def benchmark(engine, n_profiles=1000, seed=42, variant_counts=BENCHMARK_VARIANT_COUNTS):
+    """
+    Recommendations per second without and with the result cache, then
+    uncached on ``synthetic_variants`` tables of each size in ``variant_counts``.
+    
+    Uncached latency should stay nearly flat as the catalog grows: scoring is
+    one matrix multiply and a partial selection over the candidates.
+    """
+    profiles = random_profiles(n_profiles, seed)
+    
+    def run(engine, cached):
+        engine.cache = LRUCache(RESULT_CACHE_SIZE if cached else 0)
+        engine.candidate_cache = LRUCache(CANDIDATE_CACHE_SIZE if cached else 0)
+        started = time.perf_counter()
+        engine.recommend_many(profiles)
+        elapsed = time.perf_counter() - started
+        return {'variants': len(engine.features), 'seconds': elapsed, 'per_second': n_profiles / elapsed, **engine.cache.stats()}
+    
+    results = {'uncached': run(engine, cached=False), 'cached': run(engine, cached=True)}
+    for n_variants in variant_counts:
+        scaled = AdvisorEngine(synthetic_variants(engine.features, n_variants, seed), top_k=engine.top_k)
+        results[f'uncached @ {n_variants:,}'] = run(scaled, cached=False)
+    return results
+
+
+def make_handler(engine):
+    class AdvisorHandler(BaseHTTPRequestHandler):
+        def _send(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        
+        def do_GET(self):
+            if self.path == '/health':
+                self._send(200, {'status': 'ok', 'variants': len(engine.features), 'cache': engine.cache_stats()})
+            else:
+                self._send(404, {'error': 'not found'})
+        
+        def do_POST(self):
+            if self.path != '/recommend':
+                self._send(404, {'error': 'not found'})
+                return
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                profile = profile_from_json(json.loads(self.rfile.read(length) or b'{}'))
+            except KeyError as exc:
+                self._send(400, {'error': f"unknown answer label: {exc}"})
+                return
+            except (ValueError, TypeError) as exc:
+                self._send(400, {'error': str(exc)})
+                return
+            try:
+                body = recommendation_to_json(engine.recommend(profile), engine.frontier(profile))
+            except Exception as exc:  # never drop the connection without a response
+                self._send(500, {'error': f"{type(exc).__name__}: {exc}"})
+                return
+            self._send(200, body)
+    
+    return AdvisorHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless EV advisor: benchmark or serve recommendations.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    bench = commands.add_parser('bench', help="measure recommendation throughput")
+    bench.add_argument('--profiles', type=int, default=1000, help="random Quick Match profiles to rank")
+    bench.add_argument('--seed', type=int, default=42)
+    serve = commands.add_parser('serve', help="serve POST /recommend as JSON")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args(argv)
+    
+    from data_utils import read_ev_data
+    
+    engine = AdvisorEngine.from_registrations(read_ev_data())
+    if args.command == 'bench':
+        for label, stats in benchmark(engine, args.profiles, args.seed).items():
+            print(
+                f"{label:>18}: {args.profiles:,} profiles over {stats['variants']:,} variants in "
+                f"{stats['seconds']:.2f}s ({stats['per_second']:,.0f}/s, "
+                f"{stats['seconds'] / args.profiles * 1000:.1f} ms each, hit rate {stats['hit_rate']:.0%})"
+            )
+        return 0
+    
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(engine))
+    print(f"Serving {len(engine.features):,} variants on http://{args.host}:{args.port}/recommend", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
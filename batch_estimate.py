@@ -0,0 +1,315 @@
+"""
+Batch range estimation from the command line.
+
+Reads a CSV or Parquet file of trips/scenarios, joins every row with vehicle
+range stats, estimates real-world range with the vectorized range model and
+writes the rows back out with the estimates appended:
+
+    python batch_estimate.py scenarios.csv estimates.csv --workers 8
+
+Rows name a vehicle in a ``Vehicle`` column ("MAKE MODEL", as in the vehicle
+catalog) or in ``Make`` and ``Model`` columns, or carry their own
+``rated_range`` (and optional ``ev_type``). Condition columns are those of
+``range_model.scenario_conditions``; a ``distance_mi`` column also yields the
+remaining margin for the trip.
+
+The input is split into byte ranges (CSV) or row groups (Parquet) that worker
+processes read, estimate and serialize on their own, so the parent only
+concatenates finished chunks and throughput scales with cores. CSV splitting
+assumes no quoted newlines inside fields. Column types are inferred once from
+the head of a CSV and pinned for every chunk (integers become nullable and
+columns blank throughout the head become floats), so a column does not change
+type between chunks; the output is written to a temporary file and only
+replaces ``output`` once every chunk has succeeded.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from range_model import estimate_range, scenario_conditions
+
+DEFAULT_CHUNK_BYTES = 16 * 1024 * 1024
+SCHEMA_SAMPLE_ROWS = 10_000
+
+_VEHICLES: Optional[pd.DataFrame] = None
+
+
+def load_vehicle_stats(path: Optional[Path] = None) -> pd.DataFrame:
+    """
+    Return catalog-style vehicle stats indexed by vehicle name.
+
+    With no path the catalog is built from the registration dataset, exactly
+    like ``data_utils.get_vehicle_catalog`` but without the Streamlit cache.
+    """
+    if path is None:
+        from data_utils import build_vehicle_catalog, read_ev_data
+
+        return build_vehicle_catalog(read_ev_data())
+
+    stats = read_table(path)
+    if "Vehicle" in stats.columns:
+        stats = stats.set_index("Vehicle")
+    if "mean" not in stats.columns:
+        raise ValueError(f"{path} needs a 'mean' column with rated range per vehicle")
+    return stats
+
+
+def read_table(path: Path) -> pd.DataFrame:
+    if path.suffix.lower() == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def estimate_rows(rows: pd.DataFrame, vehicles: pd.DataFrame) -> pd.DataFrame:
+    """Append rated range, estimated range and trip margin to each row."""
+    if "rated_range" in rows.columns:
+        rated = rows["rated_range"].to_numpy(dtype=float, na_value=np.nan)
+        ev_type = rows["ev_type"].astype(object).to_numpy() if "ev_type" in rows.columns else None
+    else:
+        if "Vehicle" in rows.columns:
+            names = rows["Vehicle"].astype(str)
+        elif {"Make", "Model"}.issubset(rows.columns):
+            names = rows["Make"].astype(str) + " " + rows["Model"].astype(str)
+        else:
+            raise ValueError("rows need a Vehicle, Make/Model or rated_range column")
+        positions = vehicles.index.get_indexer(names.str.upper())
+        known = positions >= 0
+        rated = np.where(known, vehicles["mean"].to_numpy(dtype=float)[positions], np.nan)
+        ev_type = None
+        if "ev_type" in vehicles.columns:
+            ev_type = np.where(
+                known, vehicles["ev_type"].astype(object).to_numpy()[positions], None
+            )
+
+    estimated = estimate_range(rated, ev_type=ev_type, **scenario_conditions(rows))
+    result = rows.assign(rated_range_mi=rated, estimated_range_mi=estimated)
+    if "distance_mi" in rows.columns:
+        result["range_margin_mi"] = estimated - rows["distance_mi"].to_numpy(
+            dtype=float, na_value=np.nan
+        )
+    return result
+
+
+def csv_header(path: Path) -> List[str]:
+    """Column names of a CSV, stripped of surrounding whitespace."""
+    return pd.read_csv(path, nrows=0).columns.str.strip().tolist()
+
+
+def csv_byte_ranges(path: Path, chunk_bytes: int) -> List[Tuple[int, int]]:
+    """Split a CSV body (everything after the header) into line-aligned byte ranges."""
+    size = path.stat().st_size
+    with path.open("rb") as handle:
+        handle.readline()
+        ranges = []
+        start = handle.tell()
+        while start < size:
+            handle.seek(min(start + chunk_bytes, size))
+            if handle.tell() < size:
+                handle.readline()  # finish the current line
+            end = handle.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def csv_dtypes(
+    path: Path, header: List[str], sample_rows: int = SCHEMA_SAMPLE_ROWS
+) -> Dict[str, str]:
+    """
+    Column dtypes inferred from the head of a CSV, for reading every chunk alike.
+
+    Integers map to nullable ``Int64`` so later blank cells still parse.
+    Columns that are entirely blank in the sample are pinned to ``float64``
+    (every condition column is numeric); text further down such a column
+    fails the read instead of changing its type in one chunk.
+    """
+    sample = pd.read_csv(path, nrows=sample_rows, header=0, names=header)
+    dtypes = {}
+    for column in header:
+        values = sample[column]
+        if values.isna().all():
+            dtypes[column] = "float64"
+        elif pd.api.types.is_bool_dtype(values):
+            dtypes[column] = "boolean"
+        elif pd.api.types.is_integer_dtype(values):
+            dtypes[column] = "Int64"
+        elif pd.api.types.is_float_dtype(values):
+            dtypes[column] = "float64"
+        else:
+            dtypes[column] = "object"
+    return dtypes
+
+
+def _init_worker(vehicles: pd.DataFrame) -> None:
+    global _VEHICLES
+    _VEHICLES = vehicles
+
+
+def _serialize(result: pd.DataFrame, output_format: str, include_header: bool):
+    if output_format == "csv":
+        return result.to_csv(index=False, header=include_header).encode()
+    return result
+
+
+def _process_csv_range(task) -> Tuple[int, object]:
+    path, header, dtypes, start, end, output_format, first = task
+    with open(path, "rb") as handle:
+        handle.seek(start)
+        data = handle.read(end - start)
+    rows = pd.read_csv(io.BytesIO(data), header=None, names=header, dtype=dtypes)
+    result = estimate_rows(rows, _VEHICLES)
+    return len(result), _serialize(result, output_format, first)
+
+
+def _process_parquet_group(task) -> Tuple[int, object]:
+    import pyarrow.parquet as pq
+
+    path, row_group, output_format, first = task
+    rows = pq.ParquetFile(path).read_row_group(row_group).to_pandas()
+    result = estimate_rows(rows, _VEHICLES)
+    return len(result), _serialize(result, output_format, first)
+
+
+def _tasks(input_path: Path, output_format: str, chunk_bytes: int):
+    if input_path.suffix.lower() == ".parquet":
+        import pyarrow.parquet as pq
+
+        groups = pq.ParquetFile(input_path).num_row_groups
+        return _process_parquet_group, [
+            (str(input_path), group, output_format, group == 0) for group in range(groups)
+        ]
+
+    header = csv_header(input_path)
+    ranges = csv_byte_ranges(input_path, chunk_bytes)
+    dtypes = csv_dtypes(input_path, header)
+    return _process_csv_range, [
+        (str(input_path), header, dtypes, start, end, output_format, index == 0)
+        for index, (start, end) in enumerate(ranges)
+    ]
+
+
+def run_batch(
+    input_path: Path,
+    output_path: Path,
+    vehicles: pd.DataFrame,
+    workers: Optional[int] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+) -> int:
+    """Estimate every input row in a process pool; returns the number of rows written."""
+    output_format = "parquet" if output_path.suffix.lower() == ".parquet" else "csv"
+    worker_fn, tasks = _tasks(input_path, output_format, chunk_bytes)
+    vehicles = vehicles.copy()
+    vehicles.index = vehicles.index.astype(str).str.upper()
+
+    # Work in a temporary file next to the output so a failed run leaves no partial file
+    handle = tempfile.NamedTemporaryFile(
+        dir=output_path.parent, prefix=f".{output_path.name}.", suffix=".tmp", delete=False
+    )
+    written = 0
+    writer = None
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(vehicles,)
+        ) as pool, handle:
+            try:
+                for rows, payload in pool.map(worker_fn, tasks):
+                    written += rows
+                    if output_format == "csv":
+                        handle.write(payload)
+                        continue
+                    table = _arrow_table(payload, writer.schema if writer is not None else None)
+                    if writer is None:
+                        import pyarrow.parquet as pq
+
+                        writer = pq.ParquetWriter(handle, table.schema)
+                    writer.write_table(table)
+            finally:
+                if writer is not None:
+                    writer.close()
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(handle.name, 0o666 & ~umask)  # temp files are created private
+        os.replace(handle.name, output_path)
+    except BaseException:
+        Path(handle.name).unlink(missing_ok=True)
+        raise
+    return written
+
+
+def _arrow_table(frame: pd.DataFrame, schema=None):
+    """Arrow table of a result chunk, cast to the schema of the first chunk."""
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    if schema is None or table.schema.equals(schema):
+        return table
+    try:
+        return table.cast(schema)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, ValueError) as exc:
+        raise ValueError(f"chunk columns do not match the first chunk's types: {exc}") from exc
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("input", type=Path, help="CSV or Parquet file of trips/scenarios")
+    parser.add_argument("output", type=Path, help="CSV or Parquet file to write")
+    parser.add_argument(
+        "--vehicles",
+        type=Path,
+        help="CSV/Parquet of vehicle stats (Vehicle, mean, ev_type); defaults to the catalog "
+        "built from Electric_Vehicle_Population_Data.csv",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)"
+    )
+    parser.add_argument(
+        "--chunk-mb",
+        type=float,
+        default=DEFAULT_CHUNK_BYTES / 1024 / 1024,
+        help="approximate CSV chunk size per task in MB",
+    )
+    args = parser.parse_args(argv)
+
+    if any(path.suffix.lower() == ".parquet" for path in (args.input, args.output)):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("Parquet input/output requires pyarrow (pip install pyarrow)")
+
+    started = time.perf_counter()
+    try:
+        vehicles = load_vehicle_stats(args.vehicles)
+        rows = run_batch(
+            args.input,
+            args.output,
+            vehicles,
+            workers=args.workers,
+            chunk_bytes=max(int(args.chunk_mb * 1024 * 1024), 1),
+        )
+    except (FileNotFoundError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+
+    elapsed = time.perf_counter() - started
+    print(
+        f"Estimated {rows:,} rows in {elapsed:.1f}s "
+        f"({rows / elapsed:,.0f} rows/s, {args.workers} workers) -> {args.output}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,15 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Tuple
 
+import numpy as np
 import pandas as pd
 import streamlit as st
 
+from fleet_analysis import estimate_fleet_ranges
+from forecasting import ForecastCache, batched_trend_forecast, share_forecast
+from range_lookup import RangeLookupTable, build_lookup_tables, lookup_accuracy_report
+from range_uncertainty import simulate_range_distribution
+
 DATA_PATH = Path(__file__).resolve().parent / "Electric_Vehicle_Population_Data.csv"
 
 CATEGORICAL_DTYPES: Dict[str, str] = {
@@ -24,18 +30,33 @@ NUMERIC_COLUMNS: Dict[str, Tuple[str, str]] = {
 
 COORD_REGEX = r"POINT \((-?[\d.]+) (-?[\d.]+)\)"
 ESSENTIAL_COLUMNS = ["Make", "Model", "Electric Vehicle Type"]
+CATALOG_COLUMNS = ["Vehicle", "mean", "count", "ev_type", "model_year"]
+VARIANT_COLUMNS = [
+    "Make",
+    "Model",
+    "Model Year",
+    "Electric Vehicle Type",
+    "Electric Range",
+    "Base MSRP",
+    "Clean Alternative Fuel Vehicle (CAFV) Eligibility",
+]
 
 
 @st.cache_data(ttl=3600, show_spinner="Loading EV data...")
 def load_ev_data() -> pd.DataFrame:
     """Load the canonical dataset and perform lightweight normalization."""
-    if not DATA_PATH.exists():
+    return read_ev_data()
+
+
+def read_ev_data(path: Path = DATA_PATH) -> pd.DataFrame:
+    """Read and normalize the registration dataset (uncached)."""
+    if not path.exists():
         raise FileNotFoundError(
-            "Electric_Vehicle_Population_Data.csv not found in project root"
+            f"{path.name} not found in project root"
         )
 
     df = pd.read_csv(
-        DATA_PATH,
+        path,
         dtype=CATEGORICAL_DTYPES,
         low_memory=False,
     )
@@ -63,22 +84,103 @@ def load_ev_data() -> pd.DataFrame:
 def get_vehicle_catalog() -> pd.DataFrame:
     """Return aggregated vehicle range stats for fast lookups."""
     df = load_ev_data()
+    return build_vehicle_catalog(df)
+
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def get_range_lookup_tables() -> Dict[str, RangeLookupTable]:
+    """Return per-EV-type interpolation tables for the range estimator, built once per catalog."""
+    return build_lookup_tables(get_vehicle_catalog())
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_range_lookup_accuracy() -> pd.DataFrame:
+    """Return the interpolation error of the lookup tables versus the full model."""
+    return lookup_accuracy_report(get_range_lookup_tables())
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_range_uncertainty(n_samples: int = 10_000, seed: int = 42) -> pd.DataFrame:
+    """Return Monte Carlo range percentiles for every catalog vehicle."""
+    return simulate_range_distribution(
+        get_vehicle_catalog(),
+        n_samples=n_samples,
+        seed=seed,
+        model_year_counts=build_model_year_counts(load_ev_data()),
+    )
+
+
+@st.cache_data(ttl=3600, show_spinner="Estimating fleet range...")
+def get_fleet_range_estimates(scenario: str) -> pd.DataFrame:
+    """Return per-registration range estimates for a named weather scenario."""
+    return estimate_fleet_ranges(load_ev_data(), scenario)
+
+
+@st.cache_resource(show_spinner=False)
+def get_forecast_cache() -> ForecastCache:
+    """Fitted forecast models shared by every session and persisted across restarts."""
+    return ForecastCache()
+
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=32)
+def get_vehicle_variants(df: pd.DataFrame) -> pd.DataFrame:
+    """Cached ``build_vehicle_variants`` keyed by the (filtered) registrations."""
+    return build_vehicle_variants(df)
+
+
+def build_model_year_counts(df: pd.DataFrame) -> pd.Series:
+    """Registrations per catalog vehicle and model year (uncached)."""
+    if not {"Electric Range", "Model Year"}.issubset(df.columns):
+        return pd.Series(dtype="int64")
+
+    df_with_range = df[(df["Electric Range"] > 0) & df["Model Year"].notna()]
+    vehicle = df_with_range["Make"].astype(str) + " " + df_with_range["Model"].astype(str)
+    return df_with_range.groupby([vehicle.rename("Vehicle"), "Model Year"]).size()
+
+
+def build_vehicle_variants(df: pd.DataFrame) -> pd.DataFrame:
+    """Collapse registrations into unique vehicle variants with registration counts (uncached)."""
+    group_columns = [col for col in VARIANT_COLUMNS if col in df.columns]
+    if df.empty or not group_columns:
+        return pd.DataFrame(columns=group_columns + ["Registrations"])
+
+    return (
+        df.groupby(group_columns, observed=True, dropna=False, sort=False)
+        .size()
+        .reset_index(name="Registrations")
+        .sort_values("Registrations", ascending=False, ignore_index=True)
+    )
+
+
+def build_vehicle_catalog(df: pd.DataFrame) -> pd.DataFrame:
+    """Aggregate registrations into per-vehicle range stats (uncached)."""
     if "Electric Range" not in df.columns:
-        return pd.DataFrame(columns=["Vehicle", "mean", "count"])
+        return pd.DataFrame(columns=CATALOG_COLUMNS)
 
     df_with_range = df[df["Electric Range"] > 0].copy()
     if df_with_range.empty:
-        return pd.DataFrame(columns=["Vehicle", "mean", "count"])
+        return pd.DataFrame(columns=CATALOG_COLUMNS)
 
     df_with_range["Vehicle"] = (
         df_with_range["Make"].astype(str) + " " + df_with_range["Model"].astype(str)
     )
 
+    aggregations = {
+        "mean": ("Electric Range", "mean"),
+        "count": ("Electric Range", "count"),
+    }
+    if "Electric Vehicle Type" in df_with_range.columns:
+        aggregations["ev_type"] = ("Electric Vehicle Type", "first")
+    if "Model Year" in df_with_range.columns:
+        aggregations["model_year"] = ("Model Year", "median")
+
     catalog = (
-        df_with_range.groupby("Vehicle", observed=True)["Electric Range"]
-        .agg(["mean", "count"])
+        df_with_range.groupby("Vehicle", observed=True)
+        .agg(**aggregations)
         .sort_values(["count", "mean"], ascending=[False, False])
     )
+    if "ev_type" in catalog.columns:
+        catalog["ev_type"] = catalog["ev_type"].astype(str)
     return catalog
 
 
@@ -100,16 +202,18 @@ def get_yearly_counts(min_year: int = 2010) -> pd.DataFrame:
 
 
 @st.cache_data(ttl=3600, show_spinner=False)
-def get_market_share_history(min_year: int = 2015) -> pd.DataFrame:
-    """Return EV-type share history, ready for modeling."""
+def get_market_share_history(
+    min_year: int = 2015, column: str = "Electric Vehicle Type"
+) -> pd.DataFrame:
+    """Return yearly share history of each ``column`` value, ready for modeling."""
     df = load_ev_data()
-    required_cols = {"Model Year", "Electric Vehicle Type"}
+    required_cols = {"Model Year", column}
     if not required_cols.issubset(df.columns):
-        return pd.DataFrame(columns=["Model Year", "Electric Vehicle Type", "Count"])
+        return pd.DataFrame(columns=["Model Year", column, "Count"])
 
     yearly_breakdown = (
         df[df["Model Year"].notna() & (df["Model Year"] >= min_year)]
-        .groupby(["Model Year", "Electric Vehicle Type"], observed=True)
+        .groupby(["Model Year", column], observed=True)
         .size()
         .reset_index(name="Count")
     )
@@ -124,6 +228,76 @@ def get_market_share_history(min_year: int = 2015) -> pd.DataFrame:
     return yearly_breakdown.rename(columns={"Count_total": "Total"})
 
 
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=32)
+def get_market_share_forecast(
+    horizon: int = 5, min_year: int = 2015, column: str = "Electric Vehicle Type"
+) -> pd.DataFrame:
+    """Return forecast shares of every ``column`` value in long format; each year sums to 100."""
+    history = get_market_share_history(min_year, column)
+    if history.empty:
+        return pd.DataFrame(columns=["Model Year", column, "Percentage"])
+
+    counts = history.pivot_table(
+        index="Model Year", columns=column, values="Count", fill_value=0, observed=True
+    )
+    forecast = share_forecast(counts, horizon)
+    forecast.index.name = "Model Year"
+    return forecast.melt(
+        ignore_index=False, var_name=column, value_name="Percentage"
+    ).reset_index()
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def get_region_year_counts(column: str = "County", min_year: int = 2015) -> pd.DataFrame:
+    """Return a region x Model Year registration matrix; missing years count as zero."""
+    df = load_ev_data()
+    if column not in df.columns or "Model Year" not in df.columns:
+        return pd.DataFrame()
+
+    recent = df[df["Model Year"].notna() & (df["Model Year"] >= min_year)]
+    counts = (
+        recent.groupby([column, "Model Year"], observed=True)
+        .size()
+        .unstack("Model Year", fill_value=0)
+        .sort_index(axis=1)
+    )
+    counts.index = counts.index.astype(str)
+    counts.columns = counts.columns.astype(int)
+    return counts
+
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=32)
+def get_regional_growth(
+    column: str = "County", horizon: int = 5, min_year: int = 2015
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Return ``(history, forecast, ranking)`` for every region of ``column``.
+
+    Trends for all regions come from one batched least-squares fit; the
+    ranking orders regions by projected growth in annual registrations.
+    """
+    history = get_region_year_counts(column, min_year)
+    forecast = batched_trend_forecast(history, horizon, lower=0)
+    if history.empty:
+        return history, forecast, pd.DataFrame(
+            columns=["Registrations", "Last Year", "Projected", "Growth", "Growth %"]
+        )
+
+    last_year = history.iloc[:, -1]
+    projected = forecast.iloc[:, -1]
+    ranking = pd.DataFrame(
+        {
+            "Registrations": history.sum(axis=1),
+            "Last Year": last_year,
+            "Projected": projected,
+            "Growth": projected - last_year,
+            "Growth %": (projected - last_year) / last_year.clip(lower=1) * 100,
+        }
+    ).sort_values(["Growth", "Registrations"], ascending=False)
+    ranking.index.name = column
+    return history, forecast, ranking
+
+
 @st.cache_data(ttl=3600, show_spinner=False)
 def get_range_trends(min_year: int = 2012) -> pd.DataFrame:
     """Summarize average and max electric range by year."""
@@ -142,3 +316,21 @@ def get_range_trends(min_year: int = 2012) -> pd.DataFrame:
         .reset_index()
         .sort_values("Model Year")
     )
+
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=64)
+def get_range_histogram(range_values: np.ndarray, nbins: int = 30) -> pd.DataFrame:
+    """Bin range values on the server so charts only receive edges and counts."""
+    values = np.asarray(range_values, dtype=float)
+    values = values[np.isfinite(values)]
+    if values.size == 0:
+        return pd.DataFrame(columns=["bin_start", "bin_end", "count"])
+
+    counts, edges = np.histogram(values, bins=max(int(nbins), 1))
+    return pd.DataFrame(
+        {
+            "bin_start": edges[:-1],
+            "bin_end": edges[1:],
+            "count": counts,
+        }
+    )
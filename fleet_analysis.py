@@ -0,0 +1,99 @@
+"""
+Fleet-wide trip readiness under weather scenarios.
+
+Applies the range model to every registration row at once: each vehicle's
+rated range (or its model's catalog mean when the registry lists 0), its
+powertrain and its age-related battery fade. Results aggregate by County or
+City into the share of registered vehicles that can finish a trip.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from range_model import estimate_range
+from range_uncertainty import DEGRADATION_FLOOR, DEGRADATION_RATE_MEAN
+
+WEATHER_SCENARIOS: Dict[str, Dict[str, float]] = {
+    "Mild day (70°F)": {"temperature_f": 70.0, "speed_mph": 60.0, "hvac": 1.0},
+    "Cool day (45°F)": {"temperature_f": 45.0, "speed_mph": 60.0, "hvac": 1.0},
+    "Cold day (20°F)": {"temperature_f": 20.0, "speed_mph": 60.0, "hvac": 1.0},
+    "Arctic blast (0°F)": {"temperature_f": 0.0, "speed_mph": 60.0, "hvac": 1.0},
+    "Heat wave (100°F)": {"temperature_f": 100.0, "speed_mph": 60.0, "hvac": 1.0},
+}
+
+
+def fleet_rated_ranges(df: pd.DataFrame) -> np.ndarray:
+    """Rated range per row, filling unresearched (0) ranges with the model mean."""
+    rated = df["Electric Range"].to_numpy(dtype=float)
+    known = rated > 0
+    if not known.all() and {"Make", "Model"}.issubset(df.columns):
+        model_mean = (
+            df["Electric Range"]
+            .where(known)
+            .groupby([df["Make"], df["Model"]], observed=True)
+            .transform("mean")
+            .to_numpy(dtype=float)
+        )
+        rated = np.where(known, rated, model_mean)
+    return np.where(rated > 0, rated, np.nan)
+
+
+def estimate_fleet_ranges(
+    df: pd.DataFrame, scenario: str, current_year: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Estimate range for every registration under a named weather scenario.
+
+    Returns County, City and ``estimated_range`` aligned with ``df``'s index;
+    rows whose range cannot be inferred get NaN.
+    """
+    conditions = WEATHER_SCENARIOS[scenario]
+    current_year = current_year or date.today().year
+
+    rated = fleet_rated_ranges(df)
+    ev_type = (
+        df["Electric Vehicle Type"].astype(object).to_numpy()
+        if "Electric Vehicle Type" in df.columns
+        else None
+    )
+    if "Model Year" in df.columns:
+        age = current_year - df["Model Year"].to_numpy(dtype=float)
+        retention = np.clip(
+            1 - DEGRADATION_RATE_MEAN * np.nan_to_num(np.maximum(age, 0)),
+            DEGRADATION_FLOOR,
+            1.0,
+        )
+    else:
+        retention = 1.0
+
+    estimated = estimate_range(rated, ev_type=ev_type, **conditions) * retention
+    columns = [column for column in ("County", "City") if column in df.columns]
+    result = df[columns].copy()
+    result["estimated_range"] = estimated.astype(np.float32)
+    return result
+
+
+def summarize_trip_readiness(
+    estimates: pd.DataFrame, trip_miles: float, by: str = "County"
+) -> pd.DataFrame:
+    """Share of vehicles per area whose estimated range covers ``trip_miles``."""
+    known = estimates["estimated_range"].notna()
+    frame = pd.DataFrame(
+        {
+            by: estimates[by],
+            "known": known,
+            "can_finish": known & (estimates["estimated_range"] >= trip_miles),
+        }
+    )
+    summary = frame.groupby(by, observed=True).agg(
+        vehicles=("known", "size"),
+        with_range=("known", "sum"),
+        can_finish=("can_finish", "sum"),
+    )
+    summary["share_pct"] = summary["can_finish"] / summary["with_range"].replace(0, np.nan) * 100
+    return summary.sort_values("vehicles", ascending=False).reset_index()
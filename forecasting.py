@@ -0,0 +1,353 @@
+"""
+Yearly forecasting models and a persistent cache of fitted forecasts.
+
+``fit_forecast`` fits one of the Predictions page's algorithms to a yearly
+series and extrapolates it. Fitting a 200-tree random forest dominates the
+page, yet its inputs rarely change, so ``ForecastCache`` keeps finished
+forecasts in memory and pickles them to ``.model_cache/``: a rerun, a tab
+switch or a new server process with the same inputs loads instead of refits.
+Keys cover everything that affects the result (prediction type, algorithm,
+horizon, confidence level and a fingerprint of the training data) plus the
+scikit-learn version, since pickled models are not portable across releases.
+
+``compare_forecasts`` fits every algorithm at once on a thread pool. The
+linear fits finish in milliseconds while the forest builds its trees on all
+cores (scikit-learn releases the GIL while growing trees), so comparing all
+models takes about as long as fitting the forest alone.
+
+Prediction intervals come from a residual bootstrap for the least-squares
+models: thousands of resampled series share one design matrix, so all of
+them are refit with a single pseudo-inverse product instead of a Python
+loop of fits. The forest's interval uses the spread of its trees' votes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence
+
+import joblib
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, r2_score
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures, StandardScaler
+
+from result_cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ("Linear Regression", "Polynomial Regression (Degree 2)", "Random Forest")
+MODEL_CACHE_DIR = Path(__file__).resolve().parent / ".model_cache"
+RANDOM_FOREST_TREES = 200
+BOOTSTRAP_SAMPLES = 4000
+# Bumped whenever Forecast gains fields, so stale pickles are not reused
+FORECAST_FORMAT_VERSION = 2
+
+
+@dataclass
+class Forecast:
+    """A fitted model, its in-sample fit and its predictions for future years."""
+
+    algorithm: str
+    model: object
+    years: np.ndarray
+    predictions: np.ndarray
+    fitted: np.ndarray
+    r2: float
+    mae: float
+    fit_seconds: float = 0.0
+    lower: Optional[np.ndarray] = None
+    upper: Optional[np.ndarray] = None
+
+
+def build_model(algorithm: str):
+    """Unfitted estimator for one of ``ALGORITHMS``."""
+    if "Linear" in algorithm:
+        return LinearRegression()
+    if "Polynomial" in algorithm:
+        # Raw years squared are nearly collinear with the years; scale first
+        return make_pipeline(StandardScaler(), PolynomialFeatures(degree=2), LinearRegression())
+    if "Random Forest" in algorithm:
+        return RandomForestRegressor(
+            n_estimators=RANDOM_FOREST_TREES, random_state=42, n_jobs=-1
+        )
+    raise ValueError(f"unknown algorithm: {algorithm}")
+
+
+def fit_forecast(
+    years: np.ndarray,
+    values: np.ndarray,
+    algorithm: str,
+    horizon: int,
+    lower: Optional[float] = None,
+    confidence: Optional[float] = None,
+) -> Forecast:
+    """
+    Fit ``values`` against ``years`` and predict the next ``horizon`` years.
+
+    With ``confidence`` (a percentage), the forecast also carries the bounds
+    of that prediction interval; ``lower`` floors predictions and bounds.
+    """
+    X = np.asarray(years, dtype=float).reshape(-1, 1)
+    y = np.asarray(values, dtype=float)
+    started = time.perf_counter()
+    model = build_model(algorithm).fit(X, y)
+    fitted = model.predict(X)
+
+    last_year = int(X.max())
+    future_years = np.arange(last_year + 1, last_year + horizon + 1)
+    predictions = model.predict(future_years.reshape(-1, 1).astype(float))
+    bounds = (None, None)
+    if confidence is not None:
+        if isinstance(model, RandomForestRegressor):
+            bounds = forest_interval(model, future_years, confidence)
+        else:
+            degree = 2 if "Polynomial" in algorithm else 1
+            bounds = bootstrap_interval(X.ravel(), y, future_years, confidence, degree)
+    if lower is not None:
+        predictions = np.maximum(predictions, lower)
+        bounds = tuple(None if b is None else np.maximum(b, lower) for b in bounds)
+
+    return Forecast(
+        algorithm=algorithm,
+        model=model,
+        years=future_years,
+        predictions=predictions,
+        fitted=fitted,
+        r2=float(r2_score(y, fitted)) if len(y) > 1 else float("nan"),
+        mae=float(mean_absolute_error(y, fitted)),
+        fit_seconds=time.perf_counter() - started,
+        lower=bounds[0],
+        upper=bounds[1],
+    )
+
+
+def _tail_quantiles(samples: np.ndarray, confidence: float, axis: int):
+    tail = (100 - confidence) / 200
+    return tuple(np.quantile(samples, [tail, 1 - tail], axis=axis))
+
+
+def bootstrap_interval(
+    years: np.ndarray,
+    values: np.ndarray,
+    future_years: np.ndarray,
+    confidence: float,
+    degree: int = 1,
+    n_samples: int = BOOTSTRAP_SAMPLES,
+    seed: int = 42,
+):
+    """
+    Residual-bootstrap prediction interval of a degree-``degree`` polynomial trend.
+
+    Every resample adds shuffled residuals to the fitted curve. Because the
+    design matrix never changes, the refits of all ``n_samples`` series are
+    one ``pinv(D) @ Y*`` product; each bootstrap forecast then gets a fresh
+    residual draw so the band covers new observations, not just the trend.
+    """
+    years = np.asarray(years, dtype=float)
+    values = np.asarray(values, dtype=float)
+    n_params = degree + 1
+    if len(values) <= n_params:
+        return None, None
+
+    # Centred, scaled years keep the squared term well conditioned
+    centre, scale = years.mean(), max(years.std(), 1.0)
+    design = np.vander((years - centre) / scale, n_params)
+    future = np.vander((np.asarray(future_years, dtype=float) - centre) / scale, n_params)
+
+    solve = np.linalg.pinv(design)
+    fitted = design @ (solve @ values)
+    residuals = values - fitted
+    # Residuals understate the noise by the fitted degrees of freedom
+    residuals = (residuals - residuals.mean()) * np.sqrt(len(values) / (len(values) - n_params))
+
+    rng = np.random.default_rng(seed)
+    resampled = fitted[:, None] + rng.choice(residuals, size=(len(values), n_samples))
+    coefficients = solve @ resampled
+    paths = future @ coefficients + rng.choice(residuals, size=(len(future), n_samples))
+    return _tail_quantiles(paths, confidence, axis=1)
+
+
+def forest_interval(model: RandomForestRegressor, future_years: np.ndarray, confidence: float):
+    """Quantiles of the individual trees' predictions for each future year."""
+    X = np.asarray(future_years, dtype=float).reshape(-1, 1)
+    votes = np.stack([tree.predict(X) for tree in model.estimators_])
+    return _tail_quantiles(votes, confidence, axis=0)
+
+
+def batched_trend_forecast(
+    history: pd.DataFrame, horizon: int, degree: int = 1, lower: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    Fit a degree-``degree`` trend to every row of an entity x year matrix and
+    extrapolate ``horizon`` years; returns an entity x future-year frame.
+
+    All rows share the year design matrix, so one ``lstsq`` call with the
+    rows as right-hand sides fits them together.
+    """
+    years = history.columns.to_numpy(dtype=float)
+    last_year = int(years.max()) if len(years) else 0
+    future_years = np.arange(last_year + 1, last_year + horizon + 1)
+    if len(years) <= degree or history.empty:
+        return pd.DataFrame(np.nan, index=history.index, columns=future_years)
+
+    centre = years.mean()
+    design = np.vander(years - centre, degree + 1)
+    coefficients, *_ = np.linalg.lstsq(design, history.to_numpy(dtype=float).T, rcond=None)
+    predictions = np.vander(future_years - centre, degree + 1) @ coefficients
+    if lower is not None:
+        predictions = np.maximum(predictions, lower)
+    return pd.DataFrame(predictions.T, index=history.index, columns=future_years)
+
+
+def share_forecast(
+    counts: pd.DataFrame, horizon: int, degree: int = 1, pseudocount: float = 0.5
+) -> pd.DataFrame:
+    """
+    Forecast the percentage share of every column of a year x category count
+    matrix for the next ``horizon`` years.
+
+    Shares are mapped to centred log-ratios (log share minus the mean log
+    share of that year), every category's trend is fitted in one ``lstsq``
+    call, and the forecasts are mapped back with a softmax. ``pseudocount``
+    keeps categories with empty years finite.
+    """
+    years = counts.index.to_numpy(dtype=float)
+    last_year = int(years.max()) if len(years) else 0
+    future_years = np.arange(last_year + 1, last_year + horizon + 1)
+    if len(years) <= degree or counts.empty:
+        return pd.DataFrame(np.nan, index=future_years, columns=counts.columns)
+
+    log_shares = np.log(counts.to_numpy(dtype=float) + pseudocount)
+    ratios = log_shares - log_shares.mean(axis=1, keepdims=True)
+
+    centre = years.mean()
+    coefficients, *_ = np.linalg.lstsq(np.vander(years - centre, degree + 1), ratios, rcond=None)
+    future = np.vander(future_years - centre, degree + 1) @ coefficients
+
+    shares = np.exp(future - future.max(axis=1, keepdims=True))
+    shares = shares / shares.sum(axis=1, keepdims=True) * 100
+    return pd.DataFrame(shares, index=future_years, columns=counts.columns)
+
+
+def series_fingerprint(*arrays) -> str:
+    """Content hash of the training arrays, used as the dataset version."""
+    digest = hashlib.sha1()
+    for array in arrays:
+        array = np.ascontiguousarray(np.asarray(array, dtype=float))
+        digest.update(str(array.shape).encode())
+        digest.update(array.tobytes())
+    return digest.hexdigest()
+
+
+class ForecastCache:
+    """Fitted forecasts kept in an in-memory LRU and pickled to disk."""
+
+    def __init__(self, directory: Optional[Path] = MODEL_CACHE_DIR, maxsize: int = 64):
+        self.directory = Path(directory) if directory is not None else None
+        self.memory = LRUCache(maxsize=maxsize)
+        self.disk_hits = 0
+        self.fits = 0
+        self._sources: Dict[str, str] = {}
+
+    @staticmethod
+    def key(**parts) -> str:
+        payload = repr(sorted(parts.items())) + (
+            f"|sklearn={sklearn.__version__}|format={FORECAST_FORMAT_VERSION}"
+        )
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def source(self, parts: dict) -> Optional[str]:
+        """Where the last lookup of ``parts`` came from: "memory", "disk" or "fit"."""
+        return self._sources.get(self.key(**parts))
+
+    def _path(self, key: str) -> Optional[Path]:
+        return self.directory / f"{key}.joblib" if self.directory is not None else None
+
+    def _load(self, key: str):
+        path = self._path(key)
+        if path is None or not path.exists():
+            return None
+        try:
+            return joblib.load(path)
+        except Exception as exc:  # corrupt or incompatible pickle: refit
+            logger.warning("Discarding unreadable cached model %s: %s", path.name, exc)
+            return None
+
+    def _store(self, key: str, value) -> None:
+        path = self._path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename so concurrent readers never see a partial file
+            handle, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            os.close(handle)
+            joblib.dump(value, temp_name)
+            os.replace(temp_name, path)
+        except OSError as exc:
+            logger.warning("Could not persist model cache entry %s: %s", path.name, exc)
+
+    def get_or_fit(self, parts: dict, fit: Callable[[], Forecast]) -> Forecast:
+        """Return the cached forecast for ``parts``, fitting and storing it on a miss."""
+        key = self.key(**parts)
+        value = self.memory.get(key)
+        if value is not None:
+            self._sources[key] = "memory"
+            return value
+
+        value = self._load(key)
+        if value is not None:
+            self.disk_hits += 1
+            self._sources[key] = "disk"
+        else:
+            value = fit()
+            self.fits += 1
+            self._sources[key] = "fit"
+            self._store(key, value)
+        self.memory.put(key, value)
+        return value
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "disk_hits": self.disk_hits, "fits": self.fits}
+
+
+def compare_forecasts(
+    cache: ForecastCache,
+    parts: dict,
+    years: np.ndarray,
+    values: np.ndarray,
+    horizon: int,
+    algorithms: Sequence[str] = ALGORITHMS,
+    lower: Optional[float] = None,
+    confidence: Optional[float] = None,
+) -> Dict[str, Forecast]:
+    """
+    Fit (or load) every algorithm concurrently, keyed by ``parts`` plus the algorithm.
+
+    Results come back in ``algorithms`` order; wall time is close to that of
+    the slowest model rather than their sum.
+    """
+    with ThreadPoolExecutor(max_workers=len(algorithms) or 1) as pool:
+        futures = {
+            algorithm: pool.submit(
+                cache.get_or_fit,
+                {**parts, "algorithm": algorithm},
+                lambda algorithm=algorithm: fit_forecast(
+                    years, values, algorithm, horizon, lower, confidence
+                ),
+            )
+            for algorithm in algorithms
+        }
+        return {algorithm: future.result() for algorithm, future in futures.items()}
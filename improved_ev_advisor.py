@@ -26,11 +26,54 @@ Consumer research shows that car buyers follow a hierarchical decision process:
 This advisor mirrors real-world decision-making by applying filters in the same
 order consumers naturally use, then scoring remaining options based on research-backed
 importance weights.
+
+This module renders the Streamlit UI; filtering and ranking live in
+``advisor_engine`` so they can run headless.
 """
 
 import pandas as pd
+import plotly.express as px
 import streamlit as st
 
+from advisor_engine import (
+    BUDGET_RANGES,
+    RANGE_NEEDS,
+    RESULT_CACHE_SIZE,
+    SENSITIVITY_RADIUS,
+    SENSITIVITY_STEP,
+    TOP_K,
+    AdvisorEngine,
+    AdvisorProfile,
+    compute_scoring_features,
+)
+from data_utils import get_vehicle_variants
+from result_cache import LRUCache
+from vehicle_search import VehicleSearchIndex, rank_search_results
+
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=32)
+def get_scoring_features(variants):
+    """Cached ``compute_scoring_features`` keyed by the variant table."""
+    return compute_scoring_features(variants)
+
+
+@st.cache_resource(ttl=3600, show_spinner=False, max_entries=8)
+def get_search_index(variants):
+    """Build the Direct Search inverted index once per variant table."""
+    return VehicleSearchIndex(variants)
+
+
+@st.cache_resource(show_spinner=False)
+def get_result_cache():
+    """Recommendation cache shared by every session of this server process."""
+    return LRUCache(maxsize=RESULT_CACHE_SIZE)
+
+
+@st.cache_resource(ttl=3600, show_spinner=False, max_entries=8)
+def get_advisor_engine(variants):
+    """Advisor engine per variant table, sharing the process-wide result cache."""
+    return AdvisorEngine(variants, cache=get_result_cache())
+
 
 def create_improved_ev_advisor(df_filtered):
     """
@@ -41,8 +84,13 @@ def create_improved_ev_advisor(df_filtered):
     2. Optional refinements (brand, type, CAFV, year)
     3. Multi-criteria scoring based on consumer research priorities
     4. Diverse recommendations showing different value propositions
+    
+    Filtering and scoring run on unique vehicle variants rather than on
+    individual registrations, so each model/year/trim is considered once.
     """
     
+    variants = get_scoring_features(get_vehicle_variants(df_filtered))
+    
     st.markdown("---")
     st.subheader("💡 Smart EV Match Finder")
     st.caption("Find your perfect EV in 3 questions, or dive deeper with advanced filters")
@@ -77,40 +125,6 @@ def create_improved_ev_advisor(df_filtered):
     </style>
     """, unsafe_allow_html=True)
     
-    # Shared range requirements used by multiple tabs
-    range_requirements = {
-        "Daily commuting (< 50 mi/day)": {
-            "Not critical (city driving)": 100,
-            "Moderate (occasional trips)": 150,
-            "Important (regular highway)": 200,
-            "Essential (frequent road trips)": 250
-        },
-        "Regular road trips (> 200 mi)": {
-            "Not critical (city driving)": 200,
-            "Moderate (occasional trips)": 250,
-            "Important (regular highway)": 300,
-            "Essential (frequent road trips)": 350
-        },
-        "Family hauling & errands": {
-            "Not critical (city driving)": 120,
-            "Moderate (occasional trips)": 180,
-            "Important (regular highway)": 240,
-            "Essential (frequent road trips)": 280
-        },
-        "Weekend fun & performance": {
-            "Not critical (city driving)": 150,
-            "Moderate (occasional trips)": 200,
-            "Important (regular highway)": 250,
-            "Essential (frequent road trips)": 300
-        },
-        "General purpose / Not sure": {
-            "Not critical (city driving)": 120,
-            "Moderate (occasional trips)": 180,
-            "Important (regular highway)": 220,
-            "Essential (frequent road trips)": 260
-        }
-    }
-    
     # Create tabs for different approaches
     tab_quick, tab_detailed, tab_search = st.tabs([
         "⚡ Quick Match (30 sec)", 
@@ -141,29 +155,16 @@ def create_improved_ev_advisor(df_filtered):
                 )
             
             # Q2: Budget (Hard Constraint - #1 factor for 55% of buyers)
-            budget_ranges = {
-                "Budget-conscious (< $40k)": (0, 40000),
-                "Mid-range ($40k - $60k)": (40000, 60000),
-                "Premium ($60k - $80k)": (60000, 80000),
-                "Luxury (> $80k)": (80000, 999999),
-                "No preference": (0, 999999)
-            }
-            
             budget_choice = st.selectbox(
                 "**2. What's your budget range?**",
-                list(budget_ranges.keys()),
+                list(BUDGET_RANGES.keys()),
                 help="47% of EV buyers want vehicles under $40k - price is the #1 factor for most"
             )
             
             # Q3: Range Anxiety Level (Top EV concern globally)
             range_need = st.select_slider(
                 "**3. How important is maximum electric range to you?**",
-                options=[
-                    "Not critical (city driving)",
-                    "Moderate (occasional trips)",
-                    "Important (regular highway)",
-                    "Essential (frequent road trips)"
-                ],
+                options=list(RANGE_NEEDS),
                 value="Moderate (occasional trips)",
                 help="Range anxiety is the #1 concern for 61% of potential EV buyers"
             )
@@ -171,33 +172,18 @@ def create_improved_ev_advisor(df_filtered):
             submit_quick = st.form_submit_button("🚀 Find My Best Matches", use_container_width=True)
         
         if submit_quick:
-            # Apply non-compensatory filters (these are deal-breakers)
-            candidates = df_filtered.copy()
-            
-            # Budget filter (hard constraint)
-            min_price, max_price = budget_ranges[budget_choice]
-            if 'Base MSRP' in candidates.columns:
-                candidates = candidates[
-                    (candidates['Base MSRP'].fillna(999999) >= min_price) &
-                    (candidates['Base MSRP'].fillna(999999) <= max_price)
-                ]
-            
-            min_range = range_requirements[use_case][range_need]
-            if 'Electric Range' in candidates.columns:
-                candidates = candidates[candidates['Electric Range'].fillna(0) >= min_range]
+            # Apply non-compensatory filters (these are deal-breakers), then score
+            profile = AdvisorProfile.from_answers(use_case, budget_choice, range_need)
+            engine = get_advisor_engine(variants)
+            recommendation = engine.recommend(profile)
+            min_range = profile.min_range
             
-            if candidates.empty:
+            if recommendation.empty:
                 st.warning("⚠️ No vehicles match these criteria in the current dataset.")
                 st.info(f"**Try adjusting:** Lower range requirement ({min_range} mi → {min_range-50} mi) or increase budget ({budget_choice})")
             else:
                 # Multi-criteria scoring based on consumer research priorities
-                display_recommendations(
-                    candidates, 
-                    use_case, 
-                    budget_choice, 
-                    range_need,
-                    method="quick"
-                )
+                display_recommendations(recommendation, engine.frontier(profile))
     
     # ============================================================================
     # TAB 2: DETAILED PROFILE - For users who want control
@@ -225,18 +211,13 @@ def create_improved_ev_advisor(df_filtered):
                 
                 budget_detailed = st.selectbox(
                     "Budget range",
-                    list(budget_ranges.keys())
+                    list(BUDGET_RANGES.keys())
                 )
             
             with col2:
                 range_need_detailed = st.select_slider(
                     "Range importance",
-                    options=[
-                        "Not critical (city driving)",
-                        "Moderate (occasional trips)",
-                        "Important (regular highway)",
-                        "Essential (frequent road trips)"
-                    ],
+                    options=list(RANGE_NEEDS),
                     value="Moderate (occasional trips)"
                 )
                 
@@ -255,7 +236,7 @@ def create_improved_ev_advisor(df_filtered):
                 
                 with col3:
                     # Brand preference (34-47% factor in brand)
-                    available_makes = ["Any brand"] + sorted(df_filtered['Make'].dropna().unique().tolist()) if 'Make' in df_filtered.columns else ["Any brand"]
+                    available_makes = ["Any brand"] + sorted(variants['Make'].dropna().unique().tolist()) if 'Make' in variants.columns else ["Any brand"]
                     brand_pref = st.multiselect(
                         "Preferred brands (optional)",
                         available_makes[1:] if len(available_makes) > 1 else [],
@@ -263,9 +244,9 @@ def create_improved_ev_advisor(df_filtered):
                     )
                     
                     # Model year (freshness factor)
-                    if 'Model Year' in df_filtered.columns:
-                        year_min = int(df_filtered['Model Year'].min())
-                        year_max = int(df_filtered['Model Year'].max())
+                    if 'Model Year' in variants.columns:
+                        year_min = int(variants['Model Year'].min())
+                        year_max = int(variants['Model Year'].max())
                         year_pref = st.slider(
                             "Minimum model year",
                             min_value=year_min,
@@ -300,69 +281,31 @@ def create_improved_ev_advisor(df_filtered):
             submit_detailed = st.form_submit_button("🎯 Get Personalized Matches", use_container_width=True)
         
         if submit_detailed:
-            # Apply all filters
-            candidates_detailed = df_filtered.copy()
-            
-            # Budget
-            min_price, max_price = budget_ranges[budget_detailed]
-            if 'Base MSRP' in candidates_detailed.columns:
-                candidates_detailed = candidates_detailed[
-                    (candidates_detailed['Base MSRP'].fillna(999999) >= min_price) &
-                    (candidates_detailed['Base MSRP'].fillna(999999) <= max_price)
-                ]
-            
-            # Range
-            min_range = range_requirements[use_case_detailed][range_need_detailed]
-            if 'Electric Range' in candidates_detailed.columns:
-                candidates_detailed = candidates_detailed[
-                    candidates_detailed['Electric Range'].fillna(0) >= min_range
-                ]
-            
-            # EV Type
-            if ev_type_pref != "Any (show me all)" and 'Electric Vehicle Type' in candidates_detailed.columns:
-                type_map = {
-                    "Battery Electric (BEV only)": "Battery Electric Vehicle (BEV)",
-                    "Plug-in Hybrid (PHEV only)": "Plug-in Hybrid Electric Vehicle (PHEV)"
-                }
-                candidates_detailed = candidates_detailed[
-                    candidates_detailed['Electric Vehicle Type'] == type_map[ev_type_pref]
-                ]
-            
-            # Brand
-            if brand_pref and 'Make' in candidates_detailed.columns:
-                candidates_detailed = candidates_detailed[
-                    candidates_detailed['Make'].isin(brand_pref)
-                ]
-            
-            # Year
-            if 'year_pref' in locals() and 'Model Year' in candidates_detailed.columns:
-                candidates_detailed = candidates_detailed[
-                    candidates_detailed['Model Year'] >= year_pref
-                ]
-            
-            # CAFV
-            if cafv_pref != "Don't care" and 'Clean Alternative Fuel Vehicle (CAFV) Eligibility' in candidates_detailed.columns:
-                cafv_col = 'Clean Alternative Fuel Vehicle (CAFV) Eligibility'
-                if cafv_pref == "Must be CAFV eligible":
-                    candidates_detailed = candidates_detailed[
-                        candidates_detailed[cafv_col].astype(str).str.contains("eligible", case=False, na=False)
-                    ]
-                elif cafv_pref == "Prefer CAFV eligible":
-                    # Don't filter, but boost score later
-                    pass
+            # Apply all filters, then score with the stated priorities
+            type_map = {
+                "Battery Electric (BEV only)": "Battery Electric Vehicle (BEV)",
+                "Plug-in Hybrid (PHEV only)": "Plug-in Hybrid Electric Vehicle (PHEV)"
+            }
+            profile = AdvisorProfile.from_answers(
+                use_case_detailed,
+                budget_detailed,
+                range_need_detailed,
+                method="detailed",
+                priorities=(priority_1, priority_2, priority_3) if 'priority_1' in locals() else None,
+                ev_type=type_map.get(ev_type_pref),
+                makes=tuple(brand_pref),
+                min_year=year_pref if 'year_pref' in locals() else None,
+                # "Must be" filters; "Prefer" doesn't filter, but boosts the score
+                cafv_pref=cafv_pref
+            )
+            engine = get_advisor_engine(variants)
+            recommendation = engine.recommend(profile)
             
-            if candidates_detailed.empty:
+            if recommendation.empty:
                 st.warning("⚠️ No vehicles match all criteria. Try relaxing some filters.")
             else:
-                display_recommendations(
-                    candidates_detailed,
-                    use_case_detailed,
-                    budget_detailed,
-                    range_need_detailed,
-                    method="detailed",
-                    priorities=(priority_1, priority_2, priority_3) if 'priority_1' in locals() else None,
-                    cafv_pref=cafv_pref
-                )
+                display_recommendations(recommendation, engine.frontier(profile))
+                display_weight_sensitivity(engine.sensitivity(profile), recommendation.ranked.iloc[0])
     
     # ============================================================================
     # TAB 3: DIRECT SEARCH - For informed buyers
@@ -396,18 +339,19 @@ def create_improved_ev_advisor(df_filtered):
                 search_min_range = 0
         
         if search_query or search_min_range > 0:
-            search_results = df_filtered.copy()
+            search_results = variants
             
-            # Text search
+            # Text search over the variant index, best matches first
             if search_query:
-                query_lower = search_query.strip().lower()
-                mask = False
-                for col in ["Make", "Model", "Electric Vehicle Type", "Clean Alternative Fuel Vehicle (CAFV) Eligibility"]:
-                    if col in search_results.columns:
-                        col_mask = search_results[col].astype(str).str.lower().str.contains(query_lower, na=False)
-                        mask = col_mask if mask is False else (mask | col_mask)
-                if mask is not False:
-                    search_results = search_results[mask]
+                positions, match_scores, complete = get_search_index(variants).search(search_query)
+                search_results = rank_search_results(variants, positions, match_scores)
+                if not complete and not search_results.empty:
+                    st.caption("No vehicle matches every term; showing the closest matches.")
+            else:
+                search_results = search_results.sort_values(
+                    by=['Electric Range', 'Base MSRP'] if 'Base MSRP' in search_results.columns else ['Electric Range'],
+                    ascending=[False, True] if 'Base MSRP' in search_results.columns else [False]
+                )
             
             # Range filter
             if 'Electric Range' in search_results.columns and search_min_range > 0:
@@ -418,13 +362,13 @@ def create_improved_ev_advisor(df_filtered):
             if search_results.empty:
                 st.info("No matches found. Try broadening your search.")
             else:
-                st.success(f"Found {len(search_results)} vehicles matching your search")
+                st.success(
+                    f"Found {len(search_results)} vehicles matching your search "
+                    f"({int(search_results['Registrations'].sum()):,} registrations)"
+                )
                 
                 # Show top result
-                top_result = search_results.sort_values(
-                    by=['Electric Range', 'Base MSRP'] if 'Base MSRP' in search_results.columns else ['Electric Range'],
-                    ascending=[False, True] if 'Base MSRP' in search_results.columns else [False]
-                ).iloc[0]
+                top_result = search_results.iloc[0]
                 
                 col1, col2, col3 = st.columns(3)
                 with col1:
@@ -445,15 +389,18 @@ def create_improved_ev_advisor(df_filtered):
                     )
                 
                 # Show results table
-                display_cols = [c for c in ['Make', 'Model', 'Model Year', 'Electric Range', 'Base MSRP', 'Electric Vehicle Type', 'Clean Alternative Fuel Vehicle (CAFV) Eligibility'] if c in search_results.columns]
+                display_cols = [c for c in ['Make', 'Model', 'Model Year', 'Electric Range', 'Base MSRP', 'Electric Vehicle Type', 'Clean Alternative Fuel Vehicle (CAFV) Eligibility', 'Registrations'] if c in search_results.columns]
                 st.dataframe(
                     search_results[display_cols].head(15),
                     use_container_width=True,
                     hide_index=True
                 )
+                
+                # Nearest neighbors of the top result across the whole variant table
+                display_similar_vehicles(get_advisor_engine(variants).similar(top_result.name), top_result)
 
 
-def display_recommendations(df, use_case, budget, range_need, method="quick", priorities=None, cafv_pref=None):
+def display_recommendations(recommendation, frontier=None):
     """
     Display personalized recommendations using research-based scoring.
     
@@ -463,87 +410,16 @@ def display_recommendations(df, use_case, budget, range_need, method="quick", pr
     - Brand/Quality: 34-47% importance
     - Newness/Tech: Varies by demographic
     - Value (Range/Price): 46% cite cost savings
+    
+    ``frontier``, when given, is listed as the no-compromise options.
     """
     
-    if df.empty:
+    if recommendation.empty:
         return
     
-    # Normalize scores (0-1 scale)
-    score_df = df.copy()
-    
-    for col in ['Electric Range', 'Base MSRP', 'Model Year']:
-        if col in score_df.columns:
-            col_series = score_df[col].dropna()
-            if not col_series.empty and col_series.min() != col_series.max():
-                score_df[f'{col}_norm'] = (score_df[col] - col_series.min()) / (col_series.max() - col_series.min())
-            else:
-                score_df[f'{col}_norm'] = 0.5
-        else:
-            score_df[f'{col}_norm'] = 0.5
-    
-    # Calculate component scores
-    score_df['range_score'] = score_df.get('Electric Range_norm', 0.5)
-    score_df['price_score'] = 1 - score_df.get('Base MSRP_norm', 0.5)  # Lower price = higher score
-    score_df['newness_score'] = score_df.get('Model Year_norm', 0.5)
-    
-    # Value score (range per dollar)
-    if 'Electric Range' in score_df.columns and 'Base MSRP' in score_df.columns:
-        score_df['value_raw'] = score_df['Electric Range'] / (score_df['Base MSRP'] + 1)
-        if score_df['value_raw'].max() > score_df['value_raw'].min():
-            score_df['value_score'] = (score_df['value_raw'] - score_df['value_raw'].min()) / (score_df['value_raw'].max() - score_df['value_raw'].min())
-        else:
-            score_df['value_score'] = 0.5
-    else:
-        score_df['value_score'] = 0.5
-    
-    # CAFV bonus (if preferred)
-    if cafv_pref == "Prefer CAFV eligible" and 'Clean Alternative Fuel Vehicle (CAFV) Eligibility' in score_df.columns:
-        score_df['cafv_bonus'] = score_df['Clean Alternative Fuel Vehicle (CAFV) Eligibility'].astype(str).str.contains("eligible", case=False, na=False).astype(float) * 0.1
-    else:
-        score_df['cafv_bonus'] = 0
-    
-    # Apply weights based on use case and priorities
-    if method == "quick":
-        # Research-based default weights
-        use_case_weights = {
-            "Daily commuting (< 50 mi/day)": {'price': 0.45, 'range': 0.20, 'value': 0.25, 'newness': 0.10},
-            "Regular road trips (> 200 mi)": {'price': 0.25, 'range': 0.50, 'value': 0.15, 'newness': 0.10},
-            "Family hauling & errands": {'price': 0.35, 'range': 0.30, 'value': 0.25, 'newness': 0.10},
-            "Weekend fun & performance": {'price': 0.30, 'range': 0.30, 'value': 0.15, 'newness': 0.25},
-            "General purpose / Not sure": {'price': 0.35, 'range': 0.30, 'value': 0.25, 'newness': 0.10}
-        }
-        weights = use_case_weights[use_case]
-    else:
-        # Custom weights based on stated priorities
-        if priorities:
-            p1, p2, p3 = priorities
-            weight_map = {
-                "Lowest price": 'price',
-                "Longest range": 'range',
-                "Brand reputation": 'newness',  # Proxy: newer models from better brands
-                "Latest technology": 'newness',
-                "Best value (range/price)": 'value'
-            }
-            
-            # Priority 1 gets 50%, Priority 2 gets 30%, Priority 3 gets 20%
-            weights = {'price': 0, 'range': 0, 'value': 0, 'newness': 0}
-            weights[weight_map.get(p1, 'value')] += 0.50
-            weights[weight_map.get(p2, 'price')] += 0.30
-            weights[weight_map.get(p3, 'range')] += 0.20
-        else:
-            weights = {'price': 0.35, 'range': 0.30, 'value': 0.25, 'newness': 0.10}
-    
-    # Calculate composite score
-    score_df['composite_score'] = (
-        weights['price'] * score_df['price_score'] +
-        weights['range'] * score_df['range_score'] +
-        weights['value'] * score_df['value_score'] +
-        weights['newness'] * score_df['newness_score'] +
-        score_df['cafv_bonus']
-    )
-    
-    # Sort by composite score
-    ranked = score_df.sort_values('composite_score', ascending=False)
+    ranked = recommendation.ranked
+    alternatives = recommendation.alternatives
+    weights = recommendation.weights
     
     # Show top recommendation
     st.markdown("---")
@@ -606,12 +482,12 @@ def display_recommendations(df, use_case, budget, range_need, method="quick", pr
         for reason in reasons:
             st.markdown(reason)
     
+    display_similar_vehicles(recommendation.similar, top_vehicle)
+    
     # Show alternative options with diversity
     st.markdown("---")
     st.markdown("### 🔄 Alternative Options (Different Strengths)")
     
-    alternatives = get_diverse_alternatives(ranked, top_vehicle)
-    
     cols = st.columns(min(3, len(alternatives)))
     
     for idx, (title, vehicle, highlight) in enumerate(alternatives):
@@ -653,10 +529,10 @@ def display_recommendations(df, use_case, budget, range_need, method="quick", pr
     st.markdown("---")
     st.markdown("### 📊 Compare Top 10 Matches")
     
-    comparison_cols = [c for c in ['Make', 'Model', 'Model Year', 'Electric Range', 'Base MSRP', 'Electric Vehicle Type', 'Clean Alternative Fuel Vehicle (CAFV) Eligibility', 'composite_score'] if c in ranked.columns]
+    comparison_cols = [c for c in ['Make', 'Model', 'Model Year', 'Electric Range', 'Base MSRP', 'Electric Vehicle Type', 'Clean Alternative Fuel Vehicle (CAFV) Eligibility', 'Registrations', 'composite_score'] if c in ranked.columns]
     
     # Rename composite_score for display
-    display_df = ranked[comparison_cols].head(10).copy()
+    display_df = ranked[comparison_cols].head(TOP_K).copy()
     if 'composite_score' in display_df.columns:
         display_df['Match Score'] = (display_df['composite_score'] * 100).round(0).astype(int).astype(str) + '%'
         display_df = display_df.drop('composite_score', axis=1)
@@ -667,6 +543,26 @@ def display_recommendations(df, use_case, budget, range_need, method="quick", pr
         hide_index=True
     )
     
+    # Non-dominated options on price, range and model year
+    if frontier is not None and not frontier.empty:
+        with st.expander(f"🏆 No-compromise options ({len(frontier)} on the price/range/year frontier)"):
+            st.caption(
+                "No other match is cheaper, longer-range and at least as new at once: "
+                "gaining on one of these means giving up another."
+            )
+            frontier_cols = [c for c in ['Make', 'Model', 'Model Year', 'Electric Range', 'Base MSRP', 'Electric Vehicle Type', 'Registrations'] if c in frontier.columns]
+            st.dataframe(
+                frontier[frontier_cols],
+                use_container_width=True,
+                hide_index=True
+            )
+    
+    cache_stats = get_result_cache().stats()
+    st.caption(
+        f"Recommendation cache: {cache_stats['hit_rate']:.0%} hit rate over "
+        f"{cache_stats['hits'] + cache_stats['misses']:,} lookups ({cache_stats['entries']} results cached)"
+    )
+    
     # Educational note
     st.info("""
     **💡 Pro tip:** According to consumer research, the top factors in EV purchases are:
@@ -678,50 +574,58 @@ def display_recommendations(df, use_case, budget, range_need, method="quick", pr
     """)
 
 
-def get_diverse_alternatives(ranked_df, top_vehicle):
-    """
-    Get 2-3 alternative vehicles with different value propositions and brands.
-    Ensures brand diversity and highlights different strengths.
-    """
-    alternatives = []
-    used_makes = {top_vehicle.get('Make')}
-    
-    # Strategy 1: Best price from different brand
-    price_candidates = ranked_df[~ranked_df['Make'].isin(used_makes)]
-    if not price_candidates.empty and 'Base MSRP' in price_candidates.columns:
-        best_price = price_candidates.nsmallest(1, 'Base MSRP').iloc[0]
-        price_val = int(best_price['Base MSRP']) if pd.notna(best_price.get('Base MSRP')) else 0
-        alternatives.append((
-            "💰 Most Affordable",
-            best_price,
-            f"Best price alternative: ${price_val:,}"
-        ))
-        used_makes.add(best_price.get('Make'))
-    
-    # Strategy 2: Best range from different brand
-    range_candidates = ranked_df[~ranked_df['Make'].isin(used_makes)]
-    if not range_candidates.empty and 'Electric Range' in range_candidates.columns:
-        best_range = range_candidates.nsmallest(1, 'Electric Range', keep='last').iloc[-1]
-        range_val = int(best_range['Electric Range']) if pd.notna(best_range.get('Electric Range')) else 0
-        alternatives.append((
-            "⚡ Longest Range",
-            best_range,
-            f"Maximum range: {range_val} miles"
-        ))
-        used_makes.add(best_range.get('Make'))
-    
-    # Strategy 3: Best value (range/price) from different brand
-    value_candidates = ranked_df[~ranked_df['Make'].isin(used_makes)]
-    if not value_candidates.empty and 'value_score' in value_candidates.columns:
-        best_value = value_candidates.nlargest(1, 'value_score').iloc[0]
-        if 'Electric Range' in best_value and 'Base MSRP' in best_value:
-            range_val = best_value.get('Electric Range', 0)
-            price_val = best_value.get('Base MSRP', 1)
-            value_ratio = range_val / (price_val / 1000) if price_val > 0 else 0
-            alternatives.append((
-                "⭐ Best Value",
-                best_value,
-                f"{value_ratio:.1f} mi per $1k spent"
-            ))
-    
-    return alternatives[:3]
\ No newline at end of file
+def display_similar_vehicles(similar, vehicle):
+    """Expander listing the nearest variants to ``vehicle`` on range, price, year, type and CAFV."""
+    if similar is None or similar.empty:
+        return
+    
+    with st.expander(f"🚗 Cars like the {vehicle.get('Make', '')} {vehicle.get('Model', '')}"):
+        similar_cols = [c for c in ['Make', 'Model', 'Model Year', 'Electric Range', 'Base MSRP', 'Electric Vehicle Type', 'Registrations'] if c in similar.columns]
+        st.dataframe(
+            similar[similar_cols],
+            use_container_width=True,
+            hide_index=True
+        )
+
+
+def display_weight_sensitivity(sensitivity, top_vehicle):
+    """Show how often the top match still wins when the priority weights change."""
+    if sensitivity.empty:
+        return
+    
+    top_share = sensitivity['win_share'].get(top_vehicle.name, 0.0)
+    nearby_share = sensitivity['nearby_share'].get(top_vehicle.name, 0.0)
+    
+    with st.expander("📐 How stable is this match?"):
+        st.caption(
+            f"Every mix of price, range, value and newness weights in {SENSITIVITY_STEP:.0%} steps, "
+            f"scored at once. \"Nearby\" means within {SENSITIVITY_RADIUS:.0%} total weight of your priorities."
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Wins across all weightings", f"{top_share:.0%}")
+        with col2:
+            st.metric("Wins across nearby weightings", f"{nearby_share:.0%}")
+        
+        winners = sensitivity.head(8)
+        labels = (
+            winners['Make'].astype(str) + ' ' + winners['Model'].astype(str) + ' ' + winners['Model Year'].astype(str)
+            if {'Make', 'Model', 'Model Year'}.issubset(winners.columns)
+            else winners.index.astype(str)
+        )
+        chart = px.bar(
+            x=winners['win_share'] * 100,
+            y=labels,
+            orientation='h',
+            labels={'x': 'Share of weightings won (%)', 'y': 'Vehicle'}
+        )
+        chart.update_layout(
+            margin=dict(l=20, r=20, t=20, b=20),
+            yaxis={'categoryorder': 'total ascending'},
+            paper_bgcolor='rgba(0,0,0,0)',
+            plot_bgcolor='rgba(0,0,0,0)',
+            font=dict(color='#f0f6fc', family='Inter, sans-serif'),
+            xaxis=dict(gridcolor='#30363d'),
+            showlegend=False
+        )
+        st.plotly_chart(chart, use_container_width=True)
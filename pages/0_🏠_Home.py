@@ -6,7 +6,18 @@ import plotly.express as px
 from datetime import datetime
 from streamlit.components.v1 import html
 
-from data_utils import get_vehicle_catalog, load_ev_data
+from data_utils import (
+    get_fleet_range_estimates,
+    get_range_histogram,
+    get_range_lookup_accuracy,
+    get_range_lookup_tables,
+    get_range_uncertainty,
+    get_vehicle_catalog,
+    load_ev_data,
+)
+from fleet_analysis import WEATHER_SCENARIOS, summarize_trip_readiness
+from range_lookup import LOOKUP_ERROR_BOUND_PCT, find_lookup_table
+from trip_simulator import TripSimulator, read_trace
 
 
 # Shared dark theme for the full dashboard surface.
@@ -419,6 +430,217 @@ def create_chart_theme():
     }
 
 
+def render_range_estimator():
+    """
+    Estimate real-world range for a catalog vehicle under slider conditions.
+    Uses precomputed lookup tables so every slider change answers instantly.
+    """
+    catalog = get_vehicle_catalog()
+    tables = get_range_lookup_tables()
+    
+    if catalog.empty or not tables:
+        st.info("ℹ️ Range estimates need vehicles with a known electric range.")
+        return
+    
+    control_col, result_col = st.columns([1, 2])
+    
+    with control_col:
+        vehicle = st.selectbox(
+            "Vehicle",
+            options=catalog.index.tolist(),
+            help="Most registered models are listed first"
+        )
+        speed = st.slider("Average speed (mph)", min_value=10, max_value=90, value=65, step=5)
+        temperature = st.slider("Outside temperature (°F)", min_value=-20, max_value=110, value=70, step=5)
+        grade = st.slider("Average road grade (%)", min_value=-8.0, max_value=8.0, value=0.0, step=0.5,
+                          help="Net climb over the trip; negative values mean mostly downhill")
+    
+    vehicle_stats = catalog.loc[vehicle]
+    rated_range = float(vehicle_stats['mean'])
+    ev_type = vehicle_stats.get('ev_type', '')
+    table = find_lookup_table(tables, ev_type)
+    estimated_range = float(table.estimate(rated_range, speed, temperature, grade))
+    
+    with result_col:
+        metric_col1, metric_col2 = st.columns(2)
+        with metric_col1:
+            st.metric("Rated Range", f"{rated_range:.0f} mi")
+        with metric_col2:
+            st.metric(
+                "Estimated Real-World Range",
+                f"{estimated_range:.0f} mi",
+                delta=f"{(estimated_range / rated_range - 1) * 100:+.0f}% vs rated"
+            )
+        
+        uncertainty = get_range_uncertainty()
+        if vehicle in uncertainty.index:
+            spread = uncertainty.loc[vehicle]
+            st.caption(
+                f"Across typical Washington weather, driving styles and battery aging this model "
+                f"usually delivers {spread['p10']:.0f}–{spread['p90']:.0f} mi "
+                f"(median {spread['p50']:.0f} mi, 10th–90th percentile)."
+            )
+        
+        speeds = np.arange(10, 95, 5)
+        fig = px.line(
+            x=speeds,
+            y=table.estimate(rated_range, speeds, temperature, grade),
+            markers=True,
+            labels={'x': 'Average Speed (mph)', 'y': 'Estimated Range (miles)'}
+        )
+        theme = create_chart_theme()
+        fig.update_layout(
+            **theme,
+            height=300,
+            margin=dict(l=20, r=20, t=20, b=20),
+            showlegend=False
+        )
+        fig.update_traces(line_color='#58a6ff', marker=dict(size=6, color='#a371f7'))
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with st.expander("📐 Lookup table accuracy vs full model", expanded=False):
+        accuracy = get_range_lookup_accuracy()
+        st.caption(
+            f"Each EV type's interpolated table is checked against the full range model at random "
+            f"rated ranges across its catalog vehicles and random conditions within the slider "
+            f"limits. Estimates are accepted when they stay within "
+            f"±{LOOKUP_ERROR_BOUND_PCT:.0f}% of the full model (climate control on, no extra payload)."
+        )
+        if not accuracy.empty and not accuracy['within_bound'].all():
+            st.warning("⚠️ Some EV types exceed the accepted lookup error; their estimates are less precise.")
+        st.dataframe(accuracy.round(2), use_container_width=True, hide_index=True)
+
+
+def render_trip_simulator():
+    """
+    Replay an uploaded GPS trace (GPX or CSV) for a catalog vehicle and
+    chart battery state of charge along the way.
+    """
+    catalog = get_vehicle_catalog()
+    if catalog.empty:
+        st.info("ℹ️ Trip simulation needs vehicles with a known electric range.")
+        return
+    
+    upload_col, settings_col = st.columns([2, 1])
+    
+    with upload_col:
+        trace_file = st.file_uploader(
+            "GPS trace",
+            type=["gpx", "csv"],
+            help="GPX track, or CSV with latitude, longitude and optional elevation (m) and time columns"
+        )
+    
+    with settings_col:
+        vehicle = st.selectbox("Simulated vehicle", options=catalog.index.tolist(), key="trip_vehicle")
+        start_soc = st.slider("Starting charge (%)", min_value=10, max_value=100, value=90, step=5)
+        trip_temperature = st.slider("Outside temperature (°F)", min_value=-20, max_value=110, value=70,
+                                     step=5, key="trip_temperature")
+    
+    if trace_file is None:
+        st.caption("Upload a trace to simulate the trip.")
+        return
+    
+    vehicle_stats = catalog.loc[vehicle]
+    simulator = TripSimulator(
+        rated_range=float(vehicle_stats['mean']),
+        ev_type=vehicle_stats.get('ev_type'),
+        start_soc_pct=start_soc,
+        temperature_f=trip_temperature
+    )
+    
+    try:
+        track = [
+            (segment.trip_distance_mi, segment.soc_pct, segment.speed_mph)
+            for segment in simulator.extend(read_trace(trace_file, trace_file.name))
+        ]
+    except (ValueError, KeyError, SyntaxError) as exc:
+        # SyntaxError covers malformed GPX (xml.etree ParseError)
+        st.error(f"⚠️ Could not read GPS trace: {exc}")
+        return
+    
+    if not track:
+        st.warning("🔍 The trace needs at least two GPS points.")
+        return
+    
+    summary = simulator.summary()
+    metric_col1, metric_col2, metric_col3, metric_col4 = st.columns(4)
+    with metric_col1:
+        st.metric("Distance", f"{summary['distance_mi']:.1f} mi")
+    with metric_col2:
+        st.metric("Energy Used", f"{summary['energy_kwh']:.1f} kWh",
+                  delta=f"{summary['average_wh_per_mi']:.0f} Wh/mi", delta_color="off")
+    with metric_col3:
+        st.metric("Charge Left", f"{summary['soc_pct']:.0f}%",
+                  delta=f"{summary['soc_pct'] - start_soc:.0f} pts")
+    with metric_col4:
+        st.metric("Range Left", f"{summary['remaining_range_mi']:.0f} mi")
+    
+    if simulator.is_depleted:
+        st.warning("🪫 The battery runs out before the end of this trace.")
+    
+    # Thin very long traces so the chart payload stays small
+    step = max(1, len(track) // 2000)
+    track_df = pd.DataFrame(track[::step], columns=['Distance (mi)', 'Charge (%)', 'Speed (mph)'])
+    fig = px.line(track_df, x='Distance (mi)', y='Charge (%)', hover_data=['Speed (mph)'])
+    theme = create_chart_theme()
+    fig.update_layout(**theme, height=300, margin=dict(l=20, r=20, t=20, b=20), showlegend=False)
+    fig.update_traces(line_color='#2ea043')
+    st.plotly_chart(fig, use_container_width=True)
+
+
+def render_fleet_readiness(dataframe):
+    """
+    Show which share of registered vehicles per area can finish a trip
+    under a named weather scenario. Estimates are cached per scenario for the
+    whole registry and narrowed to the current filters by index.
+    """
+    control_col1, control_col2, control_col3 = st.columns(3)
+    
+    with control_col1:
+        scenario = st.selectbox("Weather scenario", options=list(WEATHER_SCENARIOS), index=2)
+    with control_col2:
+        trip_miles = st.slider("Trip distance (miles)", min_value=10, max_value=400, value=120, step=10)
+    with control_col3:
+        area_level = st.radio("Group by", options=['County', 'City'], horizontal=True)
+    
+    estimates = get_fleet_range_estimates(scenario)
+    estimates = estimates.loc[estimates.index.intersection(dataframe.index)]
+    if area_level not in estimates.columns or estimates.empty:
+        st.info(f"ℹ️ {area_level} information is unavailable for the current filters.")
+        return
+    
+    readiness = summarize_trip_readiness(estimates, trip_miles, by=area_level).head(15)
+    readiness[area_level] = readiness[area_level].astype(str)
+    
+    fig = px.bar(
+        readiness,
+        x='share_pct',
+        y=area_level,
+        orientation='h',
+        color='share_pct',
+        color_continuous_scale='RdYlGn',
+        range_color=(0, 100),
+        hover_data={'vehicles': ':,', 'can_finish': ':,'},
+        labels={'share_pct': 'Can Finish Trip (%)', 'vehicles': 'Registered', 'can_finish': 'Can Finish'}
+    )
+    theme = create_chart_theme()
+    fig.update_layout(
+        **theme,
+        height=450,
+        margin=dict(l=20, r=20, t=20, b=20),
+        showlegend=False
+    )
+    fig.update_yaxes(categoryorder='array', categoryarray=readiness[area_level].tolist()[::-1])
+    st.plotly_chart(fig, use_container_width=True)
+    
+    fleet_known = estimates['estimated_range'].notna()
+    fleet_share = (estimates.loc[fleet_known, 'estimated_range'] >= trip_miles).mean() * 100 if fleet_known.any() else 0
+    st.caption(
+        f"{fleet_share:.0f}% of vehicles with a known range can finish a {trip_miles}-mile trip "
+        f"in the {scenario} scenario (largest 15 areas shown)."
+    )
+
+
 def show_key_metrics(dataframe):
     """Display the main KPI metrics at the top of the dashboard."""
     total_vehicles = len(dataframe)
@@ -584,6 +806,15 @@ try:
     
     st.markdown("---")
     
+    # Real-world range under user-selected conditions
+    st.subheader("🔋 Real-World Range Estimator")
+    render_range_estimator()
+    
+    with st.expander("🛰️ Trip Battery Simulation from GPS Trace", expanded=False):
+        render_trip_simulator()
+    
+    st.markdown("---")
+    
     # Vehicle distribution charts
     st.subheader("📊 Vehicle Distribution")
     
@@ -685,19 +916,29 @@ try:
         if 'Electric Range' in filtered_data.columns:
             range_data = filtered_data[filtered_data['Electric Range'] > 0]['Electric Range']
             
-            fig = px.histogram(
-                range_data,
-                nbins=30,
-                labels={'value': 'Electric Range (miles)', 'count': 'Number of Vehicles'},
+            # Bin on the server so only bin edges and counts reach the browser
+            range_bins = get_range_histogram(range_data.to_numpy(), nbins=30)
+            bin_centers = (range_bins['bin_start'] + range_bins['bin_end']) / 2
+            
+            fig = px.bar(
+                x=bin_centers,
+                y=range_bins['count'],
+                labels={'x': 'Electric Range (miles)', 'y': 'Number of Vehicles'},
                 color_discrete_sequence=['#2ea043']
             )
+            fig.update_traces(
+                width=range_bins['bin_end'] - range_bins['bin_start'],
+                customdata=range_bins[['bin_start', 'bin_end']].to_numpy(),
+                hovertemplate='%{customdata[0]:.0f}-%{customdata[1]:.0f} mi<br>Vehicles: %{y:,}<extra></extra>'
+            )
             
             theme = create_chart_theme()
             fig.update_layout(
                 **theme,
                 height=400,
                 margin=dict(l=20, r=20, t=40, b=20),
-                showlegend=False
+                showlegend=False,
+                bargap=0
             )
             
             st.plotly_chart(fig, use_container_width=True)
@@ -761,6 +1002,12 @@ try:
     
     st.markdown("---")
     
+    # Weather-dependent trip readiness
+    st.subheader("❄️ Trip Readiness by Weather")
+    render_fleet_readiness(filtered_data)
+    
+    st.markdown("---")
+    
     # GPS Location Map
     st.subheader("🗺️ Vehicle Location Map")
     
@@ -1,24 +1,29 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import r2_score, mean_absolute_error
-from sklearn.model_selection import train_test_split
+import logging
 import time
 import warnings
 warnings.filterwarnings('ignore')
 
 from data_utils import (
+    get_forecast_cache,
+    get_market_share_forecast,
     get_market_share_history,
     get_range_trends,
+    get_regional_growth,
     get_yearly_counts,
     load_ev_data,
 )
+from forecasting import ALGORITHMS, compare_forecasts, fit_forecast, series_fingerprint
+
+MODEL_SOURCE_CAPTIONS = {
+    "memory": "⚡ Reused a fitted model from this server's model cache.",
+    "disk": "💾 Loaded a previously fitted model from the on-disk model cache.",
+    "fit": "🧠 Model fitted just now and saved to the model cache.",
+}
 
 # Note: Page config is set in the main Dashboard.py file
 
@@ -70,19 +75,53 @@ st.markdown(get_dark_theme_css(), unsafe_allow_html=True)
 
 st.sidebar.markdown("---")
 
-# Simulation function for "AI processing"
-def simulate_processing(task_name):
-    """Simulate a robust AI processing workflow (short + human)"""
-    steps = [
-        ("🔄 Crunching clean data slices...", 0.4),
-        ("🧠 Fine-tuning the model brain...", 0.6),
-        ("📊 Building the forecast story...", 0.5),
-    ]
-    with st.status(f"🤖 **Running {task_name}...**", expanded=True) as status:
-        for message, delay in steps:
-            st.write(message)
-            time.sleep(delay)
-        status.update(label=f"✅ **{task_name} ready!**", state="complete", expanded=False)
+logger = logging.getLogger("ev_predictions")
+if not logger.handlers:
+    # Streamlit leaves the root logger unconfigured, so stage timings need their own handler
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+class StageTimer:
+    """Time each pipeline stage and report it in a status widget and the log.
+
+    A stage runs from its ``stage()`` call until the next one (or ``finish()``),
+    so stages can be marked without re-indenting the page.
+    """
+
+    def __init__(self, task_name):
+        self.task_name = task_name
+        self.status = st.status(f"🤖 **Running {task_name}...**", expanded=False)
+        self.timings = []
+        self._label = None
+        self._started = self._first_started = time.perf_counter()
+
+    def _close_stage(self):
+        if self._label is None:
+            return
+        elapsed = time.perf_counter() - self._started
+        self.timings.append((self._label, elapsed))
+        self.status.write(f"{self._label} — {elapsed * 1000:,.0f} ms")
+        logger.info("%s | %s: %.1f ms", self.task_name, self._label, elapsed * 1000)
+        self._label = None
+
+    def stage(self, label):
+        self._close_stage()
+        self._label = label
+        self._started = time.perf_counter()
+
+    def finish(self):
+        self._close_stage()
+        total = time.perf_counter() - self._first_started
+        slowest = max(self.timings, key=lambda timing: timing[1])[0] if self.timings else "n/a"
+        logger.info("%s | total: %.1f ms (slowest: %s)", self.task_name, total * 1000, slowest)
+        self.status.update(
+            label=f"✅ **{self.task_name} ready in {total:.2f}s** (slowest: {slowest})",
+            state="complete",
+            expanded=False,
+        )
 
 # Title and description
 st.title("🔮 EV Adoption Predictions & Forecasting")
@@ -121,7 +160,7 @@ with st.sidebar.expander("🔧 Model Configuration", expanded=True):
 
     model_type = st.selectbox(
         "Algorithm",
-        ["Linear Regression", "Polynomial Regression (Degree 2)", "Random Forest"],
+        list(ALGORITHMS),
         index=1,
         help="Choose the machine learning algorithm"
     )
@@ -149,11 +188,12 @@ if 'has_run' not in st.session_state:
 
 if run_prediction:
     st.session_state.has_run = True
-    simulate_processing(prediction_type)
 elif not st.session_state.has_run:
     st.info("👈 **Configure settings in the sidebar and click 'Run Prediction' to start.**")
     st.stop()
 
+timer = StageTimer(prediction_type)
+
 # --- PREDICTION LOGIC ---
 
 # Prediction Type 1: EV Registration Growth
@@ -161,56 +201,53 @@ if prediction_type == "EV Registration Growth":
     st.subheader("📈 EV Registration Growth Forecast")
     
     # Tabs for organized view
-    tab1, tab2, tab3 = st.tabs(["📊 Forecast", "📉 Model Performance", "📋 Historical Data"])
+    tab1, tab2, tab3, tab4 = st.tabs(["📊 Forecast", "📉 Model Performance", "⚖️ Model Comparison", "📋 Historical Data"])
     
     # Prepare data
+    timer.stage("🔄 Data preparation")
     yearly_counts = get_yearly_counts()
     yearly_counts = yearly_counts[yearly_counts['Model Year'] >= 2010]
     if yearly_counts.empty:
+        timer.finish()
         st.warning("Need at least one full year of registrations to run this forecast.")
         st.stop()
     
-    X = yearly_counts['Model Year'].values.reshape(-1, 1)
+    X = yearly_counts['Model Year'].values
     y = yearly_counts['Count'].values
     
-    # Train/Test Split for Evaluation
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-    
-    # Model Selection & Training
-    if "Linear" in model_type:
-        model = LinearRegression()
-        model.fit(X, y)
-        r2 = r2_score(y, model.predict(X))
-        mae = mean_absolute_error(y, model.predict(X))
-        transform_fn = lambda arr: arr
-    elif "Polynomial" in model_type:
-        poly = PolynomialFeatures(degree=2)
-        X_poly = poly.fit_transform(X)
-        model = LinearRegression()
-        model.fit(X_poly, y)
-        r2 = r2_score(y, model.predict(X_poly))
-        mae = mean_absolute_error(y, model.predict(X_poly))
-        transform_fn = lambda arr: poly.transform(arr)
-    else:  # Random Forest
-        model = RandomForestRegressor(n_estimators=200, random_state=42)
-        model.fit(X, y)
-        r2 = r2_score(y, model.predict(X))
-        mae = mean_absolute_error(y, model.predict(X))
-        transform_fn = lambda arr: arr
-
-    # Future Predictions
-    last_year = int(yearly_counts['Model Year'].max())
-    future_years = np.arange(last_year + 1, last_year + forecast_years + 1).reshape(-1, 1)
-    future_pred = model.predict(transform_fn(future_years))
-    future_pred = np.maximum(future_pred, 0)  # No negative cars
+    # Train every model concurrently (reused from the model cache when inputs match)
+    timer.stage("🧠 Model fitting & forecasting")
+    forecast_cache = get_forecast_cache()
+    cache_key = dict(
+        prediction=prediction_type,
+        horizon=forecast_years,
+        confidence=confidence_interval,
+        data=series_fingerprint(X, y),
+    )
+    forecasts = compare_forecasts(
+        forecast_cache, cache_key, X, y, forecast_years,
+        lower=0,  # No negative cars
+        confidence=confidence_interval,
+    )
+    forecast = forecasts[model_type]
+    model_source = forecast_cache.source({**cache_key, 'algorithm': model_type})
+    r2, mae = forecast.r2, forecast.mae
+
+    # Future Predictions (extrapolated by fit_forecast, timed with the fit)
+    future_years = forecast.years
+    future_pred = forecast.predictions
     
     # Forecast DataFrame
     forecast_df = pd.DataFrame({
-        'Year': future_years.flatten(),
+        'Year': future_years,
         'Predicted_Count': future_pred
     })
+    if forecast.lower is not None:
+        forecast_df['Lower_Bound'] = forecast.lower
+        forecast_df['Upper_Bound'] = forecast.upper
 
     # --- TAB 1: FORECAST ---
+    timer.stage("📊 Chart build")
     with tab1:
         # Metrics Row
         m1, m2, m3, m4 = st.columns(4)
@@ -230,16 +267,14 @@ if prediction_type == "EV Registration Growth":
         # Forecast
         fig.add_trace(go.Scatter(x=forecast_df['Year'], y=forecast_df['Predicted_Count'], mode='lines+markers', name='Forecast', line=dict(color='#a371f7', width=3, dash='dash'), marker=dict(size=8)))
         
-        # Confidence Interval (Simplified visual)
-        upper_bound = forecast_df['Predicted_Count'] * (1 + (100-confidence_interval)/100)
-        lower_bound = forecast_df['Predicted_Count'] * (1 - (100-confidence_interval)/100)
-        
-        fig.add_trace(go.Scatter(
-            x=forecast_df['Year'].tolist() + forecast_df['Year'].tolist()[::-1],
-            y=upper_bound.tolist() + lower_bound.tolist()[::-1],
-            fill='toself', fillcolor='rgba(163, 113, 247, 0.1)', line=dict(color='rgba(0,0,0,0)'),
-            name=f'{confidence_interval}% Confidence Interval'
-        ))
+        # Prediction interval (residual bootstrap, or tree quantiles for the forest)
+        if forecast.lower is not None:
+            fig.add_trace(go.Scatter(
+                x=forecast_df['Year'].tolist() + forecast_df['Year'].tolist()[::-1],
+                y=forecast.upper.tolist() + forecast.lower.tolist()[::-1],
+                fill='toself', fillcolor='rgba(163, 113, 247, 0.1)', line=dict(color='rgba(0,0,0,0)'),
+                name=f'{confidence_interval}% Prediction Interval'
+            ))
 
         fig.update_layout(title="EV Registration Growth Trajectory", xaxis_title="Year", yaxis_title="Registrations", height=500, hovermode="x unified", plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', legend=dict(orientation="h", y=1.02, x=1))
         st.plotly_chart(fig, use_container_width=True)
@@ -252,45 +287,61 @@ if prediction_type == "EV Registration Growth":
         c2.metric("Mean Absolute Error (MAE)", f"{mae:.0f}", help="Average error in number of vehicles predicted vs actual.")
         
         st.info(f"**Insight:** This model ({model_type}) explains **{r2*100:.1f}%** of the variance in the historical data.")
+        st.caption(MODEL_SOURCE_CAPTIONS[model_source])
 
-    # --- TAB 3: DATA ---
+    # --- TAB 3: MODEL COMPARISON ---
     with tab3:
+        st.markdown("### ⚖️ All Models Side by Side")
+        comparison = pd.DataFrame([
+            {
+                'Model': name,
+                'R²': result.r2,
+                'MAE': result.mae,
+                f"{int(result.years[0])} Forecast": result.predictions[0],
+                f"{int(result.years[-1])} Forecast": result.predictions[-1],
+                'Fit Time (s)': result.fit_seconds,
+            }
+            for name, result in forecasts.items()
+        ]).set_index('Model')
+        st.dataframe(
+            comparison.style.format({
+                'R²': "{:.3f}",
+                'MAE': "{:,.0f}",
+                f"{int(future_years[0])} Forecast": "{:,.0f}",
+                f"{int(future_years[-1])} Forecast": "{:,.0f}",
+                'Fit Time (s)': "{:.3f}",
+            }).highlight_max(subset=['R²'], color='rgba(35, 134, 54, 0.4)'),
+            use_container_width=True
+        )
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(x=yearly_counts['Model Year'], y=yearly_counts['Count'], mode='lines+markers', name='Historical Data', line=dict(color='#58a6ff', width=3)))
+        for name, result in forecasts.items():
+            fig.add_trace(go.Scatter(x=result.years, y=result.predictions, mode='lines+markers', name=name, line=dict(dash='solid' if name == model_type else 'dash')))
+        fig.update_layout(title="Forecast by Model", xaxis_title="Year", yaxis_title="Registrations", height=450, hovermode="x unified", plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)')
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption("Models are trained in parallel; the selected model is drawn solid. Fit times are from when each model was first trained.")
+
+    # --- TAB 4: DATA ---
+    with tab4:
         st.dataframe(yearly_counts.join(forecast_df.set_index('Year'), on='Model Year', how='outer', lsuffix='_hist', rsuffix='_pred'), use_container_width=True)
 
 # Prediction Type 2: Market Share
 elif prediction_type == "Market Share by Type":
     st.subheader("🔋 EV Market Share Forecast")
+    share_labels = {"EV Type": "Electric Vehicle Type", "Make": "Make"}
+    share_by = share_labels[st.radio("Share By", list(share_labels), horizontal=True)]
     
     tab1, tab2 = st.tabs(["📊 Market Share Analysis", "📉 Trends"])
     
-    yearly_type = get_market_share_history()
-    if yearly_type.empty:
-        st.info("Not enough EV type history to build a market-share story.")
+    timer.stage("🔄 Data preparation")
+    history = get_market_share_history(column=share_by)
+    if history.empty:
+        st.info("Not enough share history to build a market-share story.")
     else:
-        history = yearly_type.copy()
-        last_year = int(history['Model Year'].max())
-        future_years = np.arange(last_year + 1, last_year + forecast_years + 1)
-        
-        future_data = []
-        for ev_type in history['Electric Vehicle Type'].unique():
-            type_data = history[history['Electric Vehicle Type'] == ev_type]
-            if len(type_data) < 2:
-                continue
-            X_type = type_data['Model Year'].values.reshape(-1, 1)
-            y_type = type_data['Percentage'].values
-            model = LinearRegression().fit(X_type, y_type)
-            pred = np.clip(model.predict(future_years.reshape(-1, 1)), 0, 100)
-            for year, pct in zip(future_years, pred):
-                future_data.append(
-                    {
-                        'Model Year': year,
-                        'Electric Vehicle Type': ev_type,
-                        'Percentage': pct,
-                        'Type': 'Forecast'
-                    }
-                )
-        
-        future_df = pd.DataFrame(future_data)
+        # All series are fitted together on log-ratios, so each year sums to 100%
+        timer.stage("🧠 Model fitting & forecasting")
+        future_df = get_market_share_forecast(forecast_years, column=share_by).assign(Type='Forecast')
         combined = pd.concat(
             [
                 history.assign(Type='Historical'),
@@ -299,12 +350,13 @@ elif prediction_type == "Market Share by Type":
             ignore_index=True
         )
         
+        timer.stage("📊 Chart build")
         with tab1:
             fig = px.area(
                 combined,
                 x='Model Year',
                 y='Percentage',
-                color='Electric Vehicle Type',
+                color=share_by,
                 pattern_shape='Type',
                 title="Market Share Evolution & Forecast",
                 color_discrete_sequence=px.colors.qualitative.Pastel
@@ -315,67 +367,105 @@ elif prediction_type == "Market Share by Type":
         with tab2:
             if not future_df.empty:
                 st.dataframe(
-                    future_df.pivot(index='Model Year', columns='Electric Vehicle Type', values='Percentage')
+                    future_df.pivot(index='Model Year', columns=share_by, values='Percentage')
                     .sort_index()
                     .style.format("{:.1f}%"),
                     use_container_width=True
                 )
             else:
-                st.info("Need at least two years per EV type to forecast its share.")
+                st.info("Need at least two years of history to forecast shares.")
 
-# Prediction Type 3: Geographic Expansion (Condensed)
+# Prediction Type 3: Geographic Expansion
 elif prediction_type == "Geographic Expansion":
     st.subheader("🗺️ Geographic Expansion Forecast")
-    top_counties = df['County'].value_counts().head(5).index.tolist()
+    region_level = st.radio("Region Level", ["County", "City"], horizontal=True)
     
-    # Simulate robust county analysis
-    st.success(f"✅ Analyzed growth patterns for top 5 counties: {', '.join(top_counties)}")
+    # Every region is fitted at once from a cached region x year matrix
+    timer.stage("🧠 Model fitting & forecasting")
+    region_history, region_forecast, ranking = get_regional_growth(region_level, forecast_years)
+    if ranking.empty:
+        timer.finish()
+        st.warning(f"No {region_level.lower()} registrations available to model.")
+        st.stop()
+    
+    st.success(f"✅ Forecast growth for all {len(ranking):,} {'counties' if region_level == 'County' else 'cities'} in one batched fit")
     
+    timer.stage("📊 Chart build")
     col1, col2 = st.columns([3, 1])
     with col2:
-        selected_county = st.selectbox("Select County", top_counties)
-    
-    county_data = df[(df['County'] == selected_county) & (df['Model Year'] >= 2015)].groupby('Model Year').size().reset_index(name='Count')
-    
-    # Simple forecast
-    X = county_data['Model Year'].values.reshape(-1, 1)
-    y = county_data['Count'].values
-    m = LinearRegression().fit(X, y)
-    
-    future_years = np.arange(county_data['Model Year'].max() + 1, county_data['Model Year'].max() + forecast_years + 1).reshape(-1, 1)
-    pred = m.predict(future_years)
+        selected_region = st.selectbox(f"Select {region_level}", ranking.index.tolist(), help="Ordered by projected growth")
+        st.metric(
+            f"{int(region_forecast.columns[-1])} Projected",
+            f"{ranking.loc[selected_region, 'Projected']:,.0f}",
+            delta=f"{ranking.loc[selected_region, 'Growth %']:+.1f}% vs {int(region_history.columns[-1])}"
+        )
     
     with col1:
         fig = go.Figure()
-        fig.add_trace(go.Bar(x=county_data['Model Year'], y=county_data['Count'], name='Historical', marker_color='#58a6ff'))
-        fig.add_trace(go.Bar(x=future_years.flatten(), y=pred, name='Forecast', marker_color='#238636', opacity=0.7))
-        fig.update_layout(title=f"Growth Forecast: {selected_county}", plot_bgcolor='rgba(0,0,0,0)', barmode='group')
+        fig.add_trace(go.Bar(x=region_history.columns, y=region_history.loc[selected_region], name='Historical', marker_color='#58a6ff'))
+        fig.add_trace(go.Bar(x=region_forecast.columns, y=region_forecast.loc[selected_region], name='Forecast', marker_color='#238636', opacity=0.7))
+        fig.update_layout(title=f"Growth Forecast: {selected_region}", plot_bgcolor='rgba(0,0,0,0)', barmode='group')
         st.plotly_chart(fig, use_container_width=True)
+    
+    st.markdown(f"### 🏁 {region_level} Growth Ranking")
+    top_growth = ranking.head(15).reset_index()
+    fig = px.bar(
+        top_growth,
+        x='Growth',
+        y=region_level,
+        orientation='h',
+        color='Growth %',
+        color_continuous_scale='Greens',
+        title=f"Projected Change in Annual Registrations by {int(region_forecast.columns[-1])}"
+    )
+    fig.update_layout(height=450, yaxis=dict(autorange='reversed'), plot_bgcolor='rgba(0,0,0,0)')
+    st.plotly_chart(fig, use_container_width=True)
+    st.dataframe(
+        ranking.style.format({
+            'Registrations': "{:,.0f}",
+            'Last Year': "{:,.0f}",
+            'Projected': "{:,.0f}",
+            'Growth': "{:+,.0f}",
+            'Growth %': "{:+.1f}%",
+        }),
+        use_container_width=True
+    )
 
 # Prediction Type 4: Range Evolution
 elif prediction_type == "Range Evolution":
     st.subheader("🔋 Battery Range Evolution")
     
     # Process data
+    timer.stage("🔄 Data preparation")
     range_data = get_range_trends()
     if range_data.empty:
+        timer.finish()
         st.warning("No electric range information available to model.")
         st.stop()
     
     # Forecast
-    X = range_data['Model Year'].values.reshape(-1, 1)
+    timer.stage("🧠 Model fitting & forecasting")
+    X = range_data['Model Year'].values
     y_mean = range_data['mean'].values
+    forecast = get_forecast_cache().get_or_fit(
+        dict(
+            prediction=prediction_type,
+            algorithm="Linear Regression",
+            horizon=forecast_years,
+            data=series_fingerprint(X, y_mean),
+        ),
+        lambda: fit_forecast(X, y_mean, "Linear Regression", forecast_years),
+    )
+    future_years = forecast.years
+    pred_mean = forecast.predictions
     
-    m = LinearRegression().fit(X, y_mean)
-    future_years = np.arange(range_data['Model Year'].max() + 1, range_data['Model Year'].max() + forecast_years + 1).reshape(-1, 1)
-    pred_mean = m.predict(future_years)
-    
+    timer.stage("📊 Chart build")
     col1, col2 = st.columns([2, 1])
     
     with col1:
         fig = go.Figure()
         fig.add_trace(go.Scatter(x=range_data['Model Year'], y=range_data['mean'], name=' Avg Range (Hist)', line=dict(color='#f1c40f', width=3)))
-        fig.add_trace(go.Scatter(x=future_years.flatten(), y=pred_mean, name='Avg Range (Pred)', line=dict(color='#e67e22', width=3, dash='dash')))
+        fig.add_trace(go.Scatter(x=future_years, y=pred_mean, name='Avg Range (Pred)', line=dict(color='#e67e22', width=3, dash='dash')))
         fig.update_layout(title="Average Range Forecast (Miles)", xaxis_title="Year", plot_bgcolor='rgba(0,0,0,0)')
         st.plotly_chart(fig, use_container_width=True)
         
@@ -384,10 +474,12 @@ elif prediction_type == "Range Evolution":
         st.metric("Predicted Avg Range (in 5 yrs)", f"{pred_mean[-1]:.0f} mi", delta=f"+{pred_mean[-1]-range_data['mean'].iloc[-1]:.0f} mi")
         st.caption("Based on historical battery technology improvements.")
 
+timer.finish()
+
 # Footer
 st.markdown("---")
 st.markdown("""
 <div style='text-align: center; color: #8b949e; font-size: 0.8rem;'>
-    <p>🤖 predictions powered by Scikit-Learn Random Forest & Regression Models | 🛡️ 95% Confidence Interval Applied</p>
+    <p>🤖 predictions powered by Scikit-Learn Random Forest & Regression Models | 🛡️ Bootstrap Prediction Intervals</p>
 </div>
 """, unsafe_allow_html=True)
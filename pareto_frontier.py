@@ -0,0 +1,62 @@
+"""
+Price / range / model-year Pareto frontier over vehicle variants.
+
+A variant is dominated when another one is no more expensive, has at least
+as much range and is at least as new, and is strictly better on one of the
+three. The non-dominated set (the skyline) holds the "no-compromise" options:
+improving any one attribute means giving up another.
+
+The skyline is found with one sort by price and a running maximum of range
+per model year threshold ("this year or newer"), computed for every
+threshold at once with ``np.maximum.accumulate``. That is O(n x distinct
+years) with no Python loop over variants; model years take a handful of
+values, so in practice it costs about as much as the sort.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMN = "Base MSRP"
+RANGE_COLUMN = "Electric Range"
+YEAR_COLUMN = "Model Year"
+FRONTIER_COLUMNS = (PRICE_COLUMN, RANGE_COLUMN, YEAR_COLUMN)
+
+
+def skyline_mask(cost: np.ndarray, gain: np.ndarray, recency: np.ndarray) -> np.ndarray:
+    """Mask of points not dominated when minimizing ``cost`` and maximizing the others."""
+    cost, gain, recency = (np.asarray(values, dtype=float) for values in (cost, gain, recency))
+    n = len(cost)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+
+    # Sorted this way, every point that dominates another comes before it
+    order = np.lexsort((-recency, -gain, cost))
+    cost, gain, recency = cost[order], gain[order], recency[order]
+
+    # Identical points do not dominate each other, so each run of identical
+    # points is judged only against the points before the run starts
+    new_run = np.ones(n, dtype=bool)
+    new_run[1:] = (
+        (cost[1:] != cost[:-1]) | (gain[1:] != gain[:-1]) | (recency[1:] != recency[:-1])
+    )
+    run_start = np.maximum.accumulate(np.where(new_run, np.arange(n), 0))
+
+    # best[t, i]: longest range among sorted points before i at year threshold t or newer
+    thresholds, year_rank = np.unique(recency, return_inverse=True)
+    eligible = year_rank[None, :] >= np.arange(len(thresholds))[:, None]
+    best = np.maximum.accumulate(np.where(eligible, gain[None, :], -np.inf), axis=1)
+    best = np.concatenate([np.full((len(thresholds), 1), -np.inf), best[:, :-1]], axis=1)
+
+    mask = np.empty(n, dtype=bool)
+    mask[order] = best[year_rank, run_start] < gain
+    return mask
+
+
+def pareto_frontier(variants: pd.DataFrame) -> pd.DataFrame:
+    """Non-dominated variants with complete price, range and year, cheapest first."""
+    complete = variants.dropna(subset=list(FRONTIER_COLUMNS))
+    price, gain, year = complete[list(FRONTIER_COLUMNS)].to_numpy(dtype=float).T
+    frontier = complete[skyline_mask(price, gain, year)]
+    return frontier.sort_values([PRICE_COLUMN, RANGE_COLUMN], ascending=[True, False])
@@ -0,0 +1,238 @@
+"""
+Precomputed range-factor lookup tables.
+
+Interactive sliders rerun the script on every change, so instead of calling
+the road-load model each time we tabulate ``estimated / rated`` range once per
+EV type on a vehicle x speed x temperature x grade grid, then answer queries
+with multilinear interpolation.
+
+Rated range only enters the model through vehicle mass, so the vehicle axis
+is the reference efficiency (miles per Wh at ``REFERENCE_CONDITIONS``) of a
+few rated ranges spanning the catalog. While the car is not regenerating,
+consumption is affine in mass, which makes the tabulated quantity exactly
+affine in reference efficiency; a handful of nodes covers every vehicle of a
+type.
+
+The grid stores ``speed / factor``, the relative energy drawn per hour of
+driving. Climate control is a constant power draw, so this quantity is close
+to linear in speed where energy per mile (``1 / factor``) bends sharply at low
+speed. The axes are not uniform: temperature includes every point where the
+model changes slope (comfort band edges, heater saturation, battery warm-up
+and the cold-capacity floor), and grade is sampled finely over descents,
+where the model switches from traction to regenerative braking at a grade
+that moves with speed and mass, and where steep grades approach the range cap.
+
+Tables are float32 (about 1.6 MB per EV type, however large the catalog) and
+assume climate control on with no extra payload, which matches the default of
+the estimator UI.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from itertools import product
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from range_model import (
+    BATTERY_WARM_F,
+    COLD_CAPACITY_FLOOR,
+    COLD_CAPACITY_LOSS_PER_F,
+    COMFORT_BAND_F,
+    COOLING_KW_PER_F,
+    COOLING_MAX_KW,
+    DEFAULT_EV_TYPE,
+    HEATING_KW_PER_F,
+    HEATING_MAX_KW,
+    MAX_RANGE_FACTOR,
+    REFERENCE_CONDITIONS,
+    consumption_wh_per_mi,
+    estimate_range,
+    range_factor,
+    vehicle_mass_kg,
+)
+
+# Largest relative error versus the full model accepted for any rated range
+# within a table's span at in-grid conditions; lookup_accuracy_report checks it
+LOOKUP_ERROR_BOUND_PCT = 2.0
+
+# Vehicle-axis nodes per EV type, evenly spaced in reference efficiency.
+# Between nodes the regen threshold moves with mass; six keep it under the bound
+RATED_RANGE_POINTS = 6
+
+# Temperatures where the model's slope changes
+TEMPERATURE_KINKS_F = (
+    COMFORT_BAND_F[0],
+    COMFORT_BAND_F[1],
+    COMFORT_BAND_F[0] - HEATING_MAX_KW / HEATING_KW_PER_F,
+    COMFORT_BAND_F[1] + COOLING_MAX_KW / COOLING_KW_PER_F,
+    BATTERY_WARM_F,
+    BATTERY_WARM_F - (1 - COLD_CAPACITY_FLOOR) / COLD_CAPACITY_LOSS_PER_F,
+)
+# Descents: regen takes over from traction between about -0.5% (10 mph) and
+# -5% (90 mph), and steeper grades run into MAX_RANGE_FACTOR
+FINE_GRADE_PCT = (-8.0, -0.5)
+
+
+def _grid(*segments, include=()) -> np.ndarray:
+    """Sorted union of inclusive ``(start, stop, step)`` ranges and extra points."""
+    start, stop = segments[0][0], segments[0][1]
+    points = [np.arange(a, b + step / 2, step) for a, b, step in segments]
+    extra = np.asarray([x for x in include if start <= x <= stop], dtype=float)
+    return np.unique(np.round(np.concatenate(points + [extra]), 6))
+
+
+LOOKUP_AXES: Dict[str, np.ndarray] = {
+    "speed_mph": _grid((10.0, 90.0, 2.0)),
+    "temperature_f": _grid((-20.0, 110.0, 10.0), include=TEMPERATURE_KINKS_F),
+    "grade_pct": _grid((-8.0, 8.0, 1.0), (*FINE_GRADE_PCT, 0.1)),
+}
+
+
+def reference_efficiency(rated_range, ev_type: str) -> np.ndarray:
+    """Miles per Wh under ``REFERENCE_CONDITIONS``; falls as rated range (and mass) grows."""
+    ref = REFERENCE_CONDITIONS
+    mass = vehicle_mass_kg(rated_range, ev_type, ref["payload_lb"])
+    return 1 / consumption_wh_per_mi(
+        mass, ref["speed_mph"], ref["temperature_f"], ref["grade_pct"], ref["hvac"], ev_type
+    )
+
+
+@dataclass(frozen=True)
+class RangeLookupTable:
+    """Range factors on the lookup grid for one EV type across a span of rated ranges."""
+
+    ev_type: str
+    rated_ranges: np.ndarray  # vehicle-axis nodes in miles, longest first
+    efficiency: np.ndarray  # reference_efficiency of each node, ascending
+    hourly_energy: np.ndarray  # speed / factor, shape (vehicle, speed, temperature, grade), float32
+
+    @property
+    def span(self):
+        """Shortest and longest rated range the table covers."""
+        return float(self.rated_ranges[-1]), float(self.rated_ranges[0])
+
+    def factor(self, rated_range, speed_mph, temperature_f, grade_pct) -> np.ndarray:
+        """Interpolate range factors; inputs broadcast and clamp to the grid."""
+        axes = (self.efficiency, *LOOKUP_AXES.values())
+        values = [
+            np.clip(np.asarray(value, dtype=float), axis[0], axis[-1])
+            for axis, value in zip(
+                axes,
+                (reference_efficiency(rated_range, self.ev_type), speed_mph, temperature_f, grade_pct),
+            )
+        ]
+        lower_index = []
+        weights = []
+        for axis, value in zip(axes, values):
+            lower = np.clip(np.searchsorted(axis, value, side="right") - 1, 0, len(axis) - 2)
+            lower_index.append(lower)
+            weights.append((value - axis[lower]) / (axis[lower + 1] - axis[lower]))
+        lower_index = np.broadcast_arrays(*lower_index)
+
+        energy = 0.0
+        for corner in product((0, 1), repeat=len(axes)):
+            weight = 1.0
+            for upper, t in zip(corner, weights):
+                weight = weight * (t if upper else 1 - t)
+            index = tuple(lower + upper for lower, upper in zip(lower_index, corner))
+            energy = energy + weight * self.hourly_energy[index]
+        inverse = energy / values[1]
+        return np.minimum(1 / np.maximum(inverse, 1 / MAX_RANGE_FACTOR), MAX_RANGE_FACTOR)
+
+    def estimate(self, rated_range, speed_mph, temperature_f, grade_pct=0.0) -> np.ndarray:
+        """Estimated real-world range in miles."""
+        return np.asarray(rated_range, dtype=float) * self.factor(
+            rated_range, speed_mph, temperature_f, grade_pct
+        )
+
+
+def build_lookup_table(
+    ev_type: str, shortest: float, longest: float, points: int = RATED_RANGE_POINTS
+) -> RangeLookupTable:
+    """Tabulate the full model for rated ranges from ``shortest`` to ``longest``."""
+    longest = max(longest, shortest + 1.0)
+    # Nodes evenly spaced in efficiency, mapped back to rated ranges
+    dense = np.linspace(shortest, longest, 1001)
+    dense_efficiency = reference_efficiency(dense, ev_type)[::-1]
+    efficiency = np.linspace(dense_efficiency[0], dense_efficiency[-1], points)
+    rated_ranges = np.interp(efficiency, dense_efficiency, dense[::-1])
+    rated_ranges[[0, -1]] = longest, shortest
+
+    speed, temperature, grade = LOOKUP_AXES.values()
+    factors = range_factor(
+        rated_ranges[:, None, None, None],
+        speed_mph=speed[None, :, None, None],
+        temperature_f=temperature[None, None, :, None],
+        grade_pct=grade[None, None, None, :],
+        ev_type=ev_type,
+    )
+    hourly_energy = (speed[None, :, None, None] / factors).astype(np.float32)
+    return RangeLookupTable(
+        ev_type, rated_ranges, reference_efficiency(rated_ranges, ev_type), hourly_energy
+    )
+
+
+def build_lookup_tables(catalog: pd.DataFrame) -> Dict[str, RangeLookupTable]:
+    """Build one table per EV type, spanning the rated ranges of its catalog vehicles."""
+    if catalog.empty:
+        return {}
+
+    ev_types = (
+        catalog["ev_type"] if "ev_type" in catalog.columns else pd.Series(DEFAULT_EV_TYPE, catalog.index)
+    )
+    rated = catalog["mean"].astype(float)
+    valid = np.isfinite(rated) & (rated > 0)
+    return {
+        ev_type: build_lookup_table(ev_type, ranges.min(), ranges.max())
+        for ev_type, ranges in rated[valid].groupby(ev_types[valid])
+    }
+
+
+def find_lookup_table(tables: Dict[str, RangeLookupTable], ev_type: str) -> RangeLookupTable:
+    """Pick the EV type's table, falling back to the default type (or any table)."""
+    if ev_type in tables:
+        return tables[ev_type]
+    return tables.get(DEFAULT_EV_TYPE) or next(iter(tables.values()))
+
+
+def lookup_accuracy_report(
+    tables: Dict[str, RangeLookupTable],
+    n_samples: int = 20_000,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Compare every table with the full model at random rated ranges within its
+    span and random in-grid conditions.
+
+    ``within_bound`` flags tables whose largest relative error stays under
+    ``LOOKUP_ERROR_BOUND_PCT``.
+    """
+    rng = np.random.default_rng(seed)
+    conditions = tuple(
+        rng.uniform(axis[0], axis[-1], n_samples) for axis in LOOKUP_AXES.values()
+    )
+
+    records = []
+    for ev_type, table in tables.items():
+        shortest, longest = table.span
+        rated = rng.uniform(shortest, longest, n_samples)
+        exact = estimate_range(rated, *conditions, ev_type=ev_type)
+        error = np.abs(table.estimate(rated, *conditions) - exact)
+        relative = error / np.maximum(exact, 1e-9) * 100
+        records.append(
+            {
+                "ev_type": ev_type,
+                "shortest_mi": shortest,
+                "longest_mi": longest,
+                "table_kb": table.hourly_energy.nbytes / 1024,
+                "mae_mi": error.mean(),
+                "max_mi": error.max(),
+                "p99_pct": np.percentile(relative, 99),
+                "max_pct": relative.max(),
+                "within_bound": relative.max() <= LOOKUP_ERROR_BOUND_PCT,
+            }
+        )
+    return pd.DataFrame(records)
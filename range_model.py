@@ -0,0 +1,278 @@
+"""
+Real-world range estimation.
+
+Rated (EPA) range assumes mild weather, mixed speeds and flat roads. This
+module adjusts it with a simple road-load model:
+
+- Rolling resistance and aerodynamic drag grow with mass and speed squared
+- Climbing costs potential energy, descending recovers part of it via regen
+- Cabin heating/cooling draws constant power, so it hurts most at low speed
+- Cold batteries deliver less usable energy
+
+Every function works on NumPy arrays and broadcasts, so a catalog of vehicles
+(shape ``(V, 1)``) against a table of scenarios (shape ``(1, S)``) is
+evaluated in one call without Python loops.
+"""
+
+from __future__ import annotations
+
+from itertools import product
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+BEV = "Battery Electric Vehicle (BEV)"
+PHEV = "Plug-in Hybrid Electric Vehicle (PHEV)"
+DEFAULT_EV_TYPE = BEV
+
+# Nominal efficiency and body parameters per powertrain. Battery capacity is
+# estimated from rated range, and pack mass from capacity.
+EV_TYPE_PARAMS: Dict[str, Dict[str, float]] = {
+    BEV: {
+        "rated_wh_per_mi": 300.0,
+        "base_mass_kg": 1450.0,
+        "kg_per_kwh": 5.5,
+        "cda_m2": 0.62,
+        "crr": 0.009,
+    },
+    PHEV: {
+        "rated_wh_per_mi": 340.0,
+        "base_mass_kg": 1600.0,
+        "kg_per_kwh": 8.0,
+        "cda_m2": 0.68,
+        "crr": 0.010,
+    },
+}
+
+# Conditions under which a vehicle is assumed to achieve its rated range.
+REFERENCE_CONDITIONS: Dict[str, float] = {
+    "speed_mph": 55.0,
+    "temperature_f": 72.0,
+    "grade_pct": 0.0,
+    "hvac": 0.0,
+    "payload_lb": 0.0,
+}
+
+GRAVITY = 9.81
+MPH_TO_MS = 0.44704
+METERS_PER_MILE = 1609.344
+FEET_PER_MILE = 5280.0
+LB_TO_KG = 0.45359237
+DRIVER_MASS_KG = 80.0
+
+DRIVETRAIN_EFFICIENCY = 0.88
+REGEN_EFFICIENCY = 0.60
+BASE_AUX_KW = 0.3
+HEATING_KW_PER_F = 0.06
+HEATING_MAX_KW = 4.0
+COOLING_KW_PER_F = 0.06
+COOLING_MAX_KW = 3.0
+COMFORT_BAND_F = (65.0, 75.0)
+COLD_CAPACITY_LOSS_PER_F = 0.003
+COLD_CAPACITY_FLOOR = 0.75
+BATTERY_WARM_F = 68.0
+MIN_SPEED_MPH = 1.0
+# A steady descent never lasts a whole charge; cap optimistic extrapolation
+MAX_RANGE_FACTOR = 2.0
+
+
+def vehicle_params(ev_type=None) -> Dict[str, np.ndarray]:
+    """Map EV type labels (scalar or array) to arrays of model parameters."""
+    types = np.asarray(DEFAULT_EV_TYPE if ev_type is None else ev_type, dtype=object)
+    params = {
+        key: np.full(types.shape, value, dtype=float)
+        for key, value in EV_TYPE_PARAMS[DEFAULT_EV_TYPE].items()
+    }
+    for label, values in EV_TYPE_PARAMS.items():
+        if label == DEFAULT_EV_TYPE:
+            continue
+        mask = types == label
+        if mask.any():
+            for key, value in values.items():
+                params[key] = np.where(mask, value, params[key])
+    return params
+
+
+def vehicle_mass_kg(rated_range, ev_type=None, payload_lb=0.0) -> np.ndarray:
+    """Estimate loaded vehicle mass from rated range, powertrain and payload."""
+    params = vehicle_params(ev_type)
+    pack_kwh = np.asarray(rated_range, dtype=float) * params["rated_wh_per_mi"] / 1000
+    return (
+        params["base_mass_kg"]
+        + params["kg_per_kwh"] * pack_kwh
+        + DRIVER_MASS_KG
+        + np.asarray(payload_lb, dtype=float) * LB_TO_KG
+    )
+
+
+def climate_power_kw(temperature_f, hvac=1.0) -> np.ndarray:
+    """Cabin heating/cooling draw in kW; ``hvac`` scales it from 0 (off) to 1."""
+    temperature_f = np.asarray(temperature_f, dtype=float)
+    low, high = COMFORT_BAND_F
+    heating = np.clip((low - temperature_f) * HEATING_KW_PER_F, 0.0, HEATING_MAX_KW)
+    cooling = np.clip((temperature_f - high) * COOLING_KW_PER_F, 0.0, COOLING_MAX_KW)
+    return (heating + cooling) * np.asarray(hvac, dtype=float)
+
+
+def battery_capacity_factor(temperature_f) -> np.ndarray:
+    """Share of nominal pack energy that is usable at the given temperature."""
+    deficit = np.maximum(BATTERY_WARM_F - np.asarray(temperature_f, dtype=float), 0.0)
+    return np.maximum(1.0 - COLD_CAPACITY_LOSS_PER_F * deficit, COLD_CAPACITY_FLOOR)
+
+
+def consumption_wh_per_mi(
+    mass_kg,
+    speed_mph,
+    temperature_f,
+    grade_pct=0.0,
+    hvac=1.0,
+    ev_type=None,
+) -> np.ndarray:
+    """Energy drawn from the pack per mile for steady driving."""
+    params = vehicle_params(ev_type)
+    mass_kg = np.asarray(mass_kg, dtype=float)
+    speed_mph = np.maximum(np.asarray(speed_mph, dtype=float), MIN_SPEED_MPH)
+    temperature_f = np.asarray(temperature_f, dtype=float)
+    speed_ms = speed_mph * MPH_TO_MS
+
+    # Air gets denser in the cold, which raises drag
+    air_density = 1.225 * 288.15 / ((temperature_f - 32) * 5 / 9 + 273.15)
+    force_n = (
+        mass_kg * GRAVITY * params["crr"]
+        + 0.5 * air_density * params["cda_m2"] * speed_ms**2
+        + mass_kg * GRAVITY * np.asarray(grade_pct, dtype=float) / 100
+    )
+    traction_j_per_m = np.where(
+        force_n > 0, force_n / DRIVETRAIN_EFFICIENCY, force_n * REGEN_EFFICIENCY
+    )
+    traction_wh_per_mi = traction_j_per_m * METERS_PER_MILE / 3600
+
+    # Constant power over the time it takes to cover one mile
+    aux_kw = BASE_AUX_KW + climate_power_kw(temperature_f, hvac)
+    aux_wh_per_mi = aux_kw * 1000 / speed_mph
+
+    # Keep consumption positive on descents; estimate_range caps the result
+    return np.maximum(traction_wh_per_mi + aux_wh_per_mi, 1.0)
+
+
+def range_factor(
+    rated_range,
+    speed_mph=REFERENCE_CONDITIONS["speed_mph"],
+    temperature_f=REFERENCE_CONDITIONS["temperature_f"],
+    grade_pct=0.0,
+    hvac=1.0,
+    payload_lb=0.0,
+    ev_type=None,
+) -> np.ndarray:
+    """
+    Ratio of real-world to rated range, before the optimism cap.
+
+    The model is calibrated so that every vehicle achieves exactly its rated
+    range under ``REFERENCE_CONDITIONS``; conditions only scale that figure.
+    """
+    rated_range = np.asarray(rated_range, dtype=float)
+    ref = REFERENCE_CONDITIONS
+    ref_mass = vehicle_mass_kg(rated_range, ev_type, ref["payload_lb"])
+    ref_consumption = consumption_wh_per_mi(
+        ref_mass, ref["speed_mph"], ref["temperature_f"], ref["grade_pct"], ref["hvac"], ev_type
+    )
+
+    mass = vehicle_mass_kg(rated_range, ev_type, payload_lb)
+    consumption = consumption_wh_per_mi(
+        mass, speed_mph, temperature_f, grade_pct, hvac, ev_type
+    )
+    capacity = battery_capacity_factor(temperature_f) / battery_capacity_factor(
+        ref["temperature_f"]
+    )
+    return capacity * ref_consumption / consumption
+
+
+def estimate_range(
+    rated_range,
+    speed_mph=REFERENCE_CONDITIONS["speed_mph"],
+    temperature_f=REFERENCE_CONDITIONS["temperature_f"],
+    grade_pct=0.0,
+    hvac=1.0,
+    payload_lb=0.0,
+    ev_type=None,
+) -> np.ndarray:
+    """Adjust rated range for driving conditions; all arguments broadcast."""
+    factor = range_factor(
+        rated_range, speed_mph, temperature_f, grade_pct, hvac, payload_lb, ev_type
+    )
+    return np.asarray(rated_range, dtype=float) * np.minimum(factor, MAX_RANGE_FACTOR)
+
+
+def grade_from_elevation(elevation_gain_ft, distance_mi) -> np.ndarray:
+    """Convert net elevation gain over a distance to an average grade in percent."""
+    distance_ft = np.asarray(distance_mi, dtype=float) * FEET_PER_MILE
+    with np.errstate(divide="ignore", invalid="ignore"):
+        grade = np.asarray(elevation_gain_ft, dtype=float) / distance_ft * 100
+    return np.where(distance_ft > 0, grade, 0.0)
+
+
+def scenario_grid(**axes) -> pd.DataFrame:
+    """Build the cartesian product of condition values, one scenario per row."""
+    names = list(axes)
+    values = [np.atleast_1d(axes[name]) for name in names]
+    return pd.DataFrame(list(product(*values)), columns=names)
+
+
+CONDITION_COLUMNS = ("speed_mph", "temperature_f", "grade_pct", "hvac", "payload_lb")
+
+
+def _scenario_column(scenarios: pd.DataFrame, column: str) -> np.ndarray:
+    default = 1.0 if column == "hvac" else REFERENCE_CONDITIONS[column]
+    if column == "grade_pct" and column not in scenarios.columns:
+        if {"elevation_gain_ft", "distance_mi"}.issubset(scenarios.columns):
+            grade = grade_from_elevation(
+                scenarios["elevation_gain_ft"].to_numpy(dtype=float, na_value=np.nan),
+                scenarios["distance_mi"].to_numpy(dtype=float, na_value=np.nan),
+            )
+            return np.where(np.isnan(grade), default, grade)
+    if column in scenarios.columns:
+        # Blank cells mean "not specified", like a missing column
+        values = scenarios[column].to_numpy(dtype=float, na_value=np.nan)
+        return np.where(np.isnan(values), default, values)
+    return np.full(len(scenarios), default)
+
+
+def scenario_conditions(scenarios: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """
+    Extract condition arrays from a scenario table.
+
+    ``scenarios`` may hold any of ``speed_mph``, ``temperature_f``,
+    ``grade_pct`` (or ``elevation_gain_ft`` with ``distance_mi``), ``hvac``
+    and ``payload_lb``; missing columns and blank cells fall back to
+    reference values with climate control on.
+    """
+    return {column: _scenario_column(scenarios, column) for column in CONDITION_COLUMNS}
+
+
+def estimate_catalog_ranges(
+    catalog: pd.DataFrame,
+    scenarios: pd.DataFrame,
+    range_column: str = "mean",
+    type_column: Optional[str] = "ev_type",
+) -> pd.DataFrame:
+    """
+    Estimate range for every catalog vehicle under every scenario.
+
+    See ``scenario_conditions`` for the accepted scenario columns. Returns a
+    vehicles x scenarios frame of miles.
+    """
+    if catalog.empty or scenarios.empty:
+        return pd.DataFrame(index=catalog.index, columns=scenarios.index, dtype=float)
+
+    rated = catalog[range_column].to_numpy(dtype=float)[:, None]
+    ev_type = (
+        catalog[type_column].astype(object).to_numpy()[:, None]
+        if type_column and type_column in catalog.columns
+        else None
+    )
+    conditions = {
+        column: values[None, :] for column, values in scenario_conditions(scenarios).items()
+    }
+    ranges = estimate_range(rated, ev_type=ev_type, **conditions)
+    return pd.DataFrame(ranges, index=catalog.index, columns=scenarios.index)
@@ -0,0 +1,165 @@
+"""
+Monte Carlo range uncertainty.
+
+A single estimate hides how much range varies with the weather, the way a
+car is driven and how much its battery has aged. This module draws driving
+conditions and battery degradation in large batches and pushes them through
+the vectorized range model, returning range percentiles per vehicle. Battery
+age is drawn per sample from each model's registered model years, so a model
+sold for a decade mixes new and heavily aged packs.
+
+Conditions are shared across vehicles within a sample (common random
+numbers), so differences between vehicles are not blurred by sampling noise.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from range_model import estimate_range
+
+# Western Washington-like climate, in °F
+TEMPERATURE_MEAN_F = 54.0
+TEMPERATURE_SD_F = 16.0
+
+# Speed profile: share of city trips, then (mean, sd) per regime in mph
+CITY_TRIP_SHARE = 0.45
+CITY_SPEED_MPH = (34.0, 6.0)
+HIGHWAY_SPEED_MPH = (64.0, 7.0)
+SPEED_BOUNDS_MPH = (10.0, 85.0)
+
+# Average grade over a full charge; long trips mostly return to their start
+GRADE_SD_PCT = 0.3
+HVAC_USE_PROBABILITY = 0.85
+
+# Capacity fade per year of age, and the floor it cannot go below
+DEGRADATION_RATE_MEAN = 0.020
+DEGRADATION_RATE_SD = 0.007
+DEGRADATION_FLOOR = 0.70
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+
+
+def sample_conditions(rng: np.random.Generator, n_samples: int) -> dict:
+    """Draw ``n_samples`` driving scenarios as arrays."""
+    city = rng.random(n_samples) < CITY_TRIP_SHARE
+    speed = np.where(
+        city,
+        rng.normal(*CITY_SPEED_MPH, n_samples),
+        rng.normal(*HIGHWAY_SPEED_MPH, n_samples),
+    )
+    return {
+        "speed_mph": np.clip(speed, *SPEED_BOUNDS_MPH),
+        "temperature_f": rng.normal(TEMPERATURE_MEAN_F, TEMPERATURE_SD_F, n_samples),
+        "grade_pct": rng.normal(0.0, GRADE_SD_PCT, n_samples),
+        "hvac": (rng.random(n_samples) < HVAC_USE_PROBABILITY).astype(float),
+    }
+
+
+def sample_model_years(
+    rng: np.random.Generator,
+    vehicles: pd.Index,
+    model_year_counts: pd.Series,
+    n_samples: int,
+    fallback_years: np.ndarray,
+) -> np.ndarray:
+    """
+    Draw model years weighted by registrations, shape ``(vehicles, n_samples)``.
+
+    ``model_year_counts`` is indexed by ``(vehicle, model year)``; vehicles
+    missing from it keep their ``fallback_years`` entry for every sample.
+    """
+    counts = (
+        model_year_counts.unstack(fill_value=0)
+        .reindex(vehicles, fill_value=0)
+        .sort_index(axis=1)
+    )
+    years = counts.columns.to_numpy(dtype=float)
+    weights = counts.to_numpy(dtype=float)
+    totals = weights.sum(axis=1)
+    shape = (len(vehicles), n_samples)
+    fallback = np.broadcast_to(np.asarray(fallback_years, dtype=float)[:, None], shape)
+    if years.size == 0:
+        return fallback.copy()
+
+    # Inverse-CDF draw for every vehicle at once: offsetting row r by r keeps
+    # the rows of the flattened CDF ordered, so one searchsorted covers all
+    rows = np.arange(len(vehicles))[:, None]
+    cdf = np.cumsum(weights, axis=1) / np.where(totals > 0, totals, 1.0)[:, None]
+    position = np.searchsorted((cdf + rows).ravel(), rng.random(shape) + rows, side="right")
+    sampled = years[np.clip(position - rows * years.size, 0, years.size - 1)]
+    return np.where((totals > 0)[:, None], sampled, fallback)
+
+
+def sample_capacity_retention(
+    rng: np.random.Generator, vehicle_age_years: np.ndarray, n_samples: int
+) -> np.ndarray:
+    """
+    Draw remaining battery capacity, shape ``(vehicles, n_samples)``.
+
+    Ages are one per vehicle or one per vehicle and sample.
+    """
+    age = np.maximum(np.asarray(vehicle_age_years, dtype=float), 0.0)
+    if age.ndim == 1:
+        age = age[:, None]
+    rate = np.maximum(
+        rng.normal(DEGRADATION_RATE_MEAN, DEGRADATION_RATE_SD, (age.shape[0], n_samples)),
+        0.0,
+    )
+    return np.clip(1.0 - rate * age, DEGRADATION_FLOOR, 1.0)
+
+
+def simulate_range_distribution(
+    catalog: pd.DataFrame,
+    n_samples: int = 10_000,
+    seed: int = 42,
+    percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+    current_year: Optional[int] = None,
+    model_year_counts: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """
+    Return range percentiles for every catalog vehicle.
+
+    The catalog needs ``mean`` (rated range) and optionally ``ev_type`` and
+    ``model_year``. With ``model_year_counts`` (registrations indexed by
+    vehicle and model year) each sample's battery age is drawn from that
+    vehicle's registered model years; otherwise every sample uses the
+    catalog ``model_year``. Vehicles without a model year are treated as new.
+    Output columns are ``rated``, ``mean`` and ``p<percentile>`` in miles.
+    """
+    columns = ["rated", "mean"] + [f"p{p:g}" for p in percentiles]
+    if catalog.empty:
+        return pd.DataFrame(columns=columns)
+
+    rng = np.random.default_rng(seed)
+    current_year = current_year or date.today().year
+
+    rated = catalog["mean"].to_numpy(dtype=float)
+    ev_type = (
+        catalog["ev_type"].astype(object).to_numpy()[:, None]
+        if "ev_type" in catalog.columns
+        else None
+    )
+    if "model_year" in catalog.columns:
+        model_year = catalog["model_year"].fillna(current_year).to_numpy(dtype=float)
+    else:
+        model_year = np.full(len(catalog), float(current_year))
+
+    conditions = {key: values[None, :] for key, values in sample_conditions(rng, n_samples).items()}
+    if model_year_counts is not None and not model_year_counts.empty:
+        model_year = sample_model_years(
+            rng, catalog.index, model_year_counts, n_samples, model_year
+        )
+    age = current_year - model_year
+    retention = sample_capacity_retention(rng, age, n_samples)
+    ranges = estimate_range(rated[:, None], ev_type=ev_type, **conditions) * retention
+
+    summary = np.percentile(ranges, percentiles, axis=1).T
+    result = pd.DataFrame(summary, index=catalog.index, columns=columns[2:])
+    result.insert(0, "mean", ranges.mean(axis=1))
+    result.insert(0, "rated", rated)
+    return result
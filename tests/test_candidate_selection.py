@@ -0,0 +1,111 @@
+"""Skyline and hard-constraint selection checked against brute-force references."""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from pareto_frontier import FRONTIER_COLUMNS, pareto_frontier, skyline_mask
+from vehicle_search import ConstraintIndex, NUMERIC_CONSTRAINT_FILL
+
+
+def brute_force_skyline(cost, gain, recency):
+    n = len(cost)
+    mask = np.ones(n, dtype=bool)
+    for i in range(n):
+        for j in range(n):
+            no_worse = cost[j] <= cost[i] and gain[j] >= gain[i] and recency[j] >= recency[i]
+            better = cost[j] < cost[i] or gain[j] > gain[i] or recency[j] > recency[i]
+            if no_worse and better:
+                mask[i] = False
+                break
+    return mask
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_skyline_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 80))
+    # Small value ranges force ties and duplicate points
+    cost, gain, recency = (rng.integers(0, 6, n).astype(float) for _ in range(3))
+    np.testing.assert_array_equal(
+        skyline_mask(cost, gain, recency), brute_force_skyline(cost, gain, recency)
+    )
+
+
+def test_skyline_continuous_values():
+    rng = np.random.default_rng(0)
+    cost, gain = rng.uniform(20_000, 100_000, 300), rng.uniform(10, 400, 300)
+    recency = rng.integers(2011, 2025, 300).astype(float)
+    np.testing.assert_array_equal(
+        skyline_mask(cost, gain, recency), brute_force_skyline(cost, gain, recency)
+    )
+
+
+def test_pareto_frontier_skips_incomplete_rows():
+    variants = pd.DataFrame(
+        {
+            "Base MSRP": [30_000, 40_000, np.nan, 35_000],
+            "Electric Range": [200, 300, 500, 150],
+            "Model Year": [2020, 2022, 2024, 2019],
+        }
+    )
+    frontier = pareto_frontier(variants)
+    assert frontier.index.tolist() == [0, 1]
+    assert not frontier[list(FRONTIER_COLUMNS)].isna().any().any()
+
+
+@pytest.fixture
+def variants():
+    rng = np.random.default_rng(7)
+    n = 500
+    frame = pd.DataFrame(
+        {
+            "Make": rng.choice(["TESLA", "NISSAN", "KIA", "BMW", "FORD"], n),
+            "Electric Vehicle Type": rng.choice(["BEV", "PHEV"], n),
+            "cafv_eligible": rng.choice([0.0, 1.0], n),
+            "Base MSRP": rng.choice([25_000, 32_000, 41_000, 58_000, 79_000], n).astype(float),
+            "Electric Range": rng.integers(0, 350, n).astype(float),
+            "Model Year": rng.integers(2011, 2025, n).astype(float),
+        }
+    )
+    frame.loc[rng.random(n) < 0.1, "Base MSRP"] = np.nan
+    frame.loc[rng.random(n) < 0.1, "Electric Range"] = np.nan
+    return frame
+
+
+def pandas_select(frame, between, isin):
+    mask = pd.Series(True, index=frame.index)
+    for column, (low, high) in between.items():
+        values = frame[column].fillna(NUMERIC_CONSTRAINT_FILL[column])
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+    for column, wanted in isin.items():
+        mask &= frame[column].isin(wanted)
+    return np.flatnonzero(mask.to_numpy())
+
+
+@pytest.mark.parametrize(
+    "between, isin",
+    [
+        ({}, {}),
+        ({"Base MSRP": (0, 40_000)}, {}),
+        ({"Base MSRP": (32_000, 58_000), "Electric Range": (150, None)}, {}),
+        ({"Electric Range": (None, 100), "Model Year": (2018, None)}, {"Make": ["KIA", "BMW"]}),
+        ({"Base MSRP": (40_000, 999_999)}, {"Electric Vehicle Type": ["BEV"], "cafv_eligible": [1.0]}),
+        ({"Electric Range": (100, 200)}, {"Make": ["NOT A MAKE"]}),
+        ({"Base MSRP": (90_000, None)}, {}),
+    ],
+)
+def test_constraint_index_matches_pandas_mask(variants, between, isin):
+    index = ConstraintIndex(variants)
+    np.testing.assert_array_equal(
+        index.select(between=between, isin=isin), pandas_select(variants, between, isin)
+    )
+
+
+def test_constraint_index_ignores_unknown_columns(variants):
+    index = ConstraintIndex(variants)
+    selected = index.select(between={"Seats": (5, None)}, isin={"Color": ["red"]})
+    np.testing.assert_array_equal(selected, np.arange(len(variants)))
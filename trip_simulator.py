@@ -0,0 +1,278 @@
+"""
+Trip energy simulation over GPS traces.
+
+A trace is a sequence of timestamped positions, either read from a GPX/CSV
+file or streamed one point at a time from a live source. ``TripSimulator``
+keeps only the previous point and running totals, so each new point costs
+constant time and long or live trips never need reprocessing.
+"""
+
+from __future__ import annotations
+
+import math
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterable, Iterator, Optional, Union
+
+import pandas as pd
+
+from range_model import (
+    BASE_AUX_KW,
+    REFERENCE_CONDITIONS,
+    battery_capacity_factor,
+    climate_power_kw,
+    consumption_wh_per_mi,
+    vehicle_mass_kg,
+)
+
+EARTH_RADIUS_MI = 3958.8
+FEET_PER_MILE = 5280.0
+METERS_PER_FOOT = 0.3048
+# GPS elevation is noisy; ignore implausible grades between close fixes
+MAX_GRADE_PCT = 15.0
+MIN_SEGMENT_MI = 0.0006  # ~1 m
+
+CSV_COLUMN_ALIASES = {
+    "latitude": ("latitude", "lat"),
+    "longitude": ("longitude", "lon", "lng"),
+    "elevation_m": ("elevation_m", "elevation", "ele", "altitude"),
+    "timestamp": ("timestamp", "time", "datetime"),
+}
+
+
+@dataclass(frozen=True)
+class TracePoint:
+    """One GPS fix; ``timestamp`` is seconds since the epoch."""
+
+    latitude: float
+    longitude: float
+    elevation_m: Optional[float] = None
+    timestamp: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class TripSegment:
+    """Derived quantities between two consecutive fixes."""
+
+    distance_mi: float
+    duration_s: float
+    speed_mph: float
+    grade_pct: float
+    energy_kwh: float
+    soc_pct: float
+    trip_distance_mi: float
+
+
+def haversine_mi(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two coordinates in miles."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_MI * math.asin(min(1.0, math.sqrt(a)))
+
+
+class TripSimulator:
+    """
+    Advance battery state of charge along a trace, one point at a time.
+
+    The pack is sized so that the vehicle achieves its rated range under the
+    model's reference conditions, and cold weather shrinks usable energy the
+    same way as in ``range_model.estimate_range``.
+    """
+
+    def __init__(
+        self,
+        rated_range: float,
+        ev_type: Optional[str] = None,
+        start_soc_pct: float = 100.0,
+        temperature_f: float = REFERENCE_CONDITIONS["temperature_f"],
+        hvac: float = 1.0,
+        payload_lb: float = 0.0,
+    ):
+        ref = REFERENCE_CONDITIONS
+        self.ev_type = ev_type
+        self.temperature_f = temperature_f
+        self.hvac = hvac
+        self.mass_kg = float(vehicle_mass_kg(rated_range, ev_type, payload_lb))
+
+        ref_mass = float(vehicle_mass_kg(rated_range, ev_type, ref["payload_lb"]))
+        ref_wh_per_mi = float(
+            consumption_wh_per_mi(
+                ref_mass, ref["speed_mph"], ref["temperature_f"], ref["grade_pct"], ref["hvac"], ev_type
+            )
+        )
+        self.usable_kwh = (
+            rated_range
+            * ref_wh_per_mi
+            / 1000
+            * float(battery_capacity_factor(temperature_f) / battery_capacity_factor(ref["temperature_f"]))
+        )
+
+        self.soc_pct = float(start_soc_pct)
+        self.distance_mi = 0.0
+        self.duration_s = 0.0
+        self.energy_kwh = 0.0
+        self.points = 0
+        self._previous: Optional[TracePoint] = None
+        self._speed_mph = ref["speed_mph"]
+
+    @property
+    def remaining_kwh(self) -> float:
+        return self.usable_kwh * self.soc_pct / 100
+
+    @property
+    def average_wh_per_mi(self) -> float:
+        return self.energy_kwh * 1000 / self.distance_mi if self.distance_mi else 0.0
+
+    @property
+    def remaining_range_mi(self) -> float:
+        """Remaining range at the trip's average consumption so far."""
+        if not self.average_wh_per_mi:
+            return 0.0
+        return self.remaining_kwh * 1000 / self.average_wh_per_mi
+
+    @property
+    def is_depleted(self) -> bool:
+        return self.soc_pct <= 0
+
+    def push(self, point: TracePoint) -> Optional[TripSegment]:
+        """Consume the next fix; returns the new segment, or None for the first point."""
+        previous, self._previous = self._previous, point
+        self.points += 1
+        if previous is None:
+            return None
+
+        distance = haversine_mi(
+            previous.latitude, previous.longitude, point.latitude, point.longitude
+        )
+        duration = 0.0
+        if point.timestamp is not None and previous.timestamp is not None:
+            duration = max(point.timestamp - previous.timestamp, 0.0)
+        # Keep the last known speed when fixes share a timestamp
+        if duration > 0 and distance >= MIN_SEGMENT_MI:
+            self._speed_mph = distance / (duration / 3600)
+
+        grade = 0.0
+        if (
+            distance >= MIN_SEGMENT_MI
+            and point.elevation_m is not None
+            and previous.elevation_m is not None
+        ):
+            rise_mi = (point.elevation_m - previous.elevation_m) / METERS_PER_FOOT / FEET_PER_MILE
+            grade = max(-MAX_GRADE_PCT, min(MAX_GRADE_PCT, rise_mi / distance * 100))
+
+        wh_per_mi = float(
+            consumption_wh_per_mi(
+                self.mass_kg, self._speed_mph, self.temperature_f, grade, self.hvac, self.ev_type
+            )
+        )
+        energy = wh_per_mi * distance / 1000
+        # Idling between fixes still runs auxiliaries, which the per-mile model
+        # only accounts for while moving
+        if distance < MIN_SEGMENT_MI and duration > 0:
+            aux_kw = BASE_AUX_KW + float(climate_power_kw(self.temperature_f, self.hvac))
+            energy = aux_kw * duration / 3600
+
+        self.distance_mi += distance
+        self.duration_s += duration
+        self.energy_kwh += energy
+        if self.usable_kwh > 0:
+            self.soc_pct = max(self.soc_pct - energy / self.usable_kwh * 100, 0.0)
+
+        return TripSegment(
+            distance_mi=distance,
+            duration_s=duration,
+            speed_mph=self._speed_mph,
+            grade_pct=grade,
+            energy_kwh=energy,
+            soc_pct=self.soc_pct,
+            trip_distance_mi=self.distance_mi,
+        )
+
+    def extend(self, points: Iterable[TracePoint]) -> Iterator[TripSegment]:
+        """Push many points lazily, yielding each produced segment."""
+        for point in points:
+            segment = self.push(point)
+            if segment is not None:
+                yield segment
+
+    def summary(self) -> dict:
+        return {
+            "points": self.points,
+            "distance_mi": self.distance_mi,
+            "duration_min": self.duration_s / 60,
+            "energy_kwh": self.energy_kwh,
+            "average_wh_per_mi": self.average_wh_per_mi,
+            "soc_pct": self.soc_pct,
+            "remaining_range_mi": self.remaining_range_mi,
+        }
+
+
+def _to_epoch_seconds(value) -> Optional[float]:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    timestamp = pd.Timestamp(value)
+    if pd.isna(timestamp):
+        return None
+    return timestamp.timestamp()
+
+
+def read_gpx(source: Union[str, Path, IO]) -> Iterator[TracePoint]:
+    """Stream track points from a GPX file without loading the whole tree."""
+    for _, element in ET.iterparse(source, events=("end",)):
+        if not element.tag.endswith("trkpt"):
+            continue
+        elevation = time = None
+        for child in element:
+            if child.tag.endswith("ele") and child.text:
+                elevation = float(child.text)
+            elif child.tag.endswith("time") and child.text:
+                time = _to_epoch_seconds(child.text)
+        yield TracePoint(
+            latitude=float(element.attrib["lat"]),
+            longitude=float(element.attrib["lon"]),
+            elevation_m=elevation,
+            timestamp=time,
+        )
+        element.clear()
+
+
+def read_csv_trace(source: Union[str, Path, IO], chunksize: int = 10_000) -> Iterator[TracePoint]:
+    """Stream points from a CSV with latitude/longitude and optional elevation/time."""
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        lookup = {column.strip().lower(): column for column in chunk.columns}
+        columns = {}
+        for field, aliases in CSV_COLUMN_ALIASES.items():
+            columns[field] = next((lookup[a] for a in aliases if a in lookup), None)
+        if columns["latitude"] is None or columns["longitude"] is None:
+            raise ValueError("GPS trace CSV needs latitude and longitude columns")
+
+        latitudes = chunk[columns["latitude"]].to_numpy(dtype=float)
+        longitudes = chunk[columns["longitude"]].to_numpy(dtype=float)
+        elevations = (
+            chunk[columns["elevation_m"]].to_numpy(dtype=float)
+            if columns["elevation_m"]
+            else [None] * len(chunk)
+        )
+        times = (
+            pd.to_datetime(chunk[columns["timestamp"]], errors="coerce", utc=True)
+            if columns["timestamp"]
+            else [None] * len(chunk)
+        )
+        for lat, lon, ele, time in zip(latitudes, longitudes, elevations, times):
+            yield TracePoint(
+                latitude=lat,
+                longitude=lon,
+                elevation_m=None if ele is None or math.isnan(ele) else float(ele),
+                timestamp=_to_epoch_seconds(time),
+            )
+
+
+def read_trace(source: Union[str, Path, IO], name: Optional[str] = None) -> Iterator[TracePoint]:
+    """Dispatch on the file extension of ``name`` (or the path) to a trace reader."""
+    label = str(name or getattr(source, "name", source)).lower()
+    if label.endswith(".gpx"):
+        return read_gpx(source)
+    return read_csv_trace(source)
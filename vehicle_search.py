@@ -0,0 +1,255 @@
+"""
+Text search over vehicle variants.
+
+``VehicleSearchIndex`` tokenizes the distinct values of the searchable
+columns once and keeps a sorted token list with a posting array of variant
+positions per token. A query resolves each term to the tokens it equals or
+prefixes with binary search, so lookups never touch registration rows and
+cost depends only on the vocabulary and the number of matching variants.
+
+Terms with no exact or prefix match fall back to a trigram index over the
+same vocabulary, so typos ("modle", "priuss") still find their token, and
+common nicknames ("chevy", "vw") are rewritten through ``TOKEN_ALIASES``.
+
+``ConstraintIndex`` answers the advisor's hard constraints: numeric bounds
+binary-search presorted columns and categorical filters read per-value
+posting arrays, and the resulting sorted position sets are intersected.
+"""
+
+from __future__ import annotations
+
+import re
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+SEARCH_COLUMNS = (
+    "Make",
+    "Model",
+    "Electric Vehicle Type",
+    "Clean Alternative Fuel Vehicle (CAFV) Eligibility",
+)
+
+# Numeric constraint columns and the value used for missing entries: unknown
+# prices count as unaffordable, unknown ranges as zero
+NUMERIC_CONSTRAINT_FILL = {
+    "Base MSRP": 999999,
+    "Electric Range": 0,
+    "Model Year": 0,
+}
+CATEGORICAL_CONSTRAINT_COLUMNS = ("Make", "Electric Vehicle Type", "cafv_eligible")
+
+EXACT_MATCH_SCORE = 1.0
+PREFIX_MATCH_SCORE = 0.6
+# Fuzzy matches score this times their trigram similarity
+FUZZY_MATCH_SCORE = 0.8
+MIN_FUZZY_SIMILARITY = 0.4
+MIN_FUZZY_TERM_LENGTH = 3
+
+# Nicknames and run-together spellings, rewritten before lookup
+TOKEN_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "chevy": ("chevrolet",),
+    "vw": ("volkswagen",),
+    "bimmer": ("bmw",),
+    "beemer": ("bmw",),
+    "caddy": ("cadillac",),
+    "merc": ("mercedes",),
+    "benz": ("mercedes",),
+    "mache": ("mach", "e"),
+    "plugin": ("plug", "in"),
+}
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text) -> List[str]:
+    """Lowercase alphanumeric tokens; hyphens and punctuation split words."""
+    return _TOKEN_PATTERN.findall(str(text).lower())
+
+
+def expand_aliases(terms: Sequence[str]) -> List[str]:
+    """Replace known nicknames with the tokens used in the dataset."""
+    expanded: List[str] = []
+    for term in terms:
+        expanded.extend(TOKEN_ALIASES.get(term, (term,)))
+    return expanded
+
+
+def trigrams(token: str) -> Set[str]:
+    """Padded character trigrams, so word starts weigh more than endings."""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class VehicleSearchIndex:
+    """Token and prefix inverted index mapping terms to variant positions."""
+
+    def __init__(self, variants: pd.DataFrame, columns: Sequence[str] = SEARCH_COLUMNS):
+        self.size = len(variants)
+        postings: Dict[str, List[np.ndarray]] = defaultdict(list)
+
+        for column in columns:
+            if column not in variants.columns:
+                continue
+            codes, uniques = pd.factorize(variants[column].astype(str))
+            # Group variant positions by distinct value in one pass
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            for code, value in enumerate(uniques):
+                positions = order[bounds[code]:bounds[code + 1]]
+                for token in set(tokenize(value)):
+                    postings[token].append(positions)
+
+        self.tokens: List[str] = sorted(postings)
+        self.postings: List[np.ndarray] = [
+            np.unique(np.concatenate(postings[token])) for token in self.tokens
+        ]
+
+        self._token_trigrams = [len(trigrams(token)) for token in self.tokens]
+        self._trigram_postings: Dict[str, List[int]] = defaultdict(list)
+        for position, token in enumerate(self.tokens):
+            for gram in trigrams(token):
+                self._trigram_postings[gram].append(position)
+
+    def fuzzy_tokens(self, term: str) -> List[Tuple[int, float]]:
+        """Vocabulary positions similar to ``term`` with their Dice similarity."""
+        grams = trigrams(term)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigram_postings.get(gram, ()))
+        matches = []
+        for position, count in shared.items():
+            similarity = 2 * count / (len(grams) + self._token_trigrams[position])
+            if similarity >= MIN_FUZZY_SIMILARITY:
+                matches.append((position, similarity))
+        return matches
+
+    def _term_scores(self, term: str) -> np.ndarray:
+        """Best match score of one query term for every variant."""
+        scores = np.zeros(self.size)
+        lo = bisect_left(self.tokens, term)
+        hi = bisect_right(self.tokens, term + "\uffff")
+        matches = [
+            (position, EXACT_MATCH_SCORE if self.tokens[position] == term else PREFIX_MATCH_SCORE)
+            for position in range(lo, hi)
+        ]
+        if not matches and len(term) >= MIN_FUZZY_TERM_LENGTH:
+            matches = [
+                (position, FUZZY_MATCH_SCORE * similarity)
+                for position, similarity in self.fuzzy_tokens(term)
+            ]
+        for position, weight in matches:
+            ids = self.postings[position]
+            scores[ids] = np.maximum(scores[ids], weight)
+        return scores
+
+    def search(self, query: str) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """
+        Return ``(positions, scores, complete)`` for a free-text query.
+
+        Variants matching every term are returned when there are any
+        (``complete`` is True); otherwise variants matching the most terms.
+        Scores sum the per-term match quality; positions are unordered.
+        """
+        terms = list(dict.fromkeys(expand_aliases(tokenize(query))))
+        if not terms or not self.size:
+            return np.array([], dtype=int), np.array([]), True
+
+        term_scores = np.vstack([self._term_scores(term) for term in terms])
+        matched_terms = (term_scores > 0).sum(axis=0)
+        best = matched_terms.max()
+        if best == 0:
+            return np.array([], dtype=int), np.array([]), False
+
+        positions = np.flatnonzero(matched_terms == best)
+        return positions, term_scores[:, positions].sum(axis=0), best == len(terms)
+
+
+def rank_search_results(
+    variants: pd.DataFrame, positions: np.ndarray, scores: np.ndarray
+) -> pd.DataFrame:
+    """Order matches by score, then longest range and most registrations."""
+    results = variants.iloc[positions].assign(match_score=scores)
+    sort_cols = ["match_score"] + [
+        col for col in ("Electric Range", "Registrations") if col in results.columns
+    ]
+    return results.sort_values(sort_cols, ascending=False, na_position="last")
+
+
+class ConstraintIndex:
+    """Sorted numeric columns and categorical postings over variant positions."""
+
+    def __init__(
+        self,
+        variants: pd.DataFrame,
+        numeric: Mapping[str, float] = NUMERIC_CONSTRAINT_FILL,
+        categorical: Sequence[str] = CATEGORICAL_CONSTRAINT_COLUMNS,
+    ):
+        self.size = len(variants)
+        self._sorted: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for column, fill in numeric.items():
+            if column in variants.columns:
+                values = variants[column].fillna(fill).to_numpy(dtype=float)
+                order = np.argsort(values, kind="stable")
+                self._sorted[column] = (values[order], order)
+
+        self._postings: Dict[str, Dict[object, np.ndarray]] = {}
+        for column in categorical:
+            if column in variants.columns:
+                codes, uniques = pd.factorize(variants[column])
+                order = np.argsort(codes, kind="stable")
+                bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+                self._postings[column] = {
+                    value: order[bounds[code]:bounds[code + 1]]
+                    for code, value in enumerate(uniques)
+                }
+
+    def between(
+        self, column: str, low: Optional[float] = None, high: Optional[float] = None
+    ) -> np.ndarray:
+        """Sorted positions whose ``column`` lies in ``[low, high]``."""
+        values, order = self._sorted[column]
+        start = 0 if low is None else np.searchsorted(values, low, side="left")
+        stop = len(values) if high is None else np.searchsorted(values, high, side="right")
+        return np.sort(order[start:stop])
+
+    def isin(self, column: str, wanted: Iterable) -> np.ndarray:
+        """Sorted positions whose ``column`` equals any of ``wanted``."""
+        postings = self._postings[column]
+        matches = [postings[value] for value in wanted if value in postings]
+        if not matches:
+            return np.array([], dtype=np.intp)
+        return np.sort(np.concatenate(matches))
+
+    def select(
+        self,
+        between: Optional[Mapping[str, Tuple[Optional[float], Optional[float]]]] = None,
+        isin: Optional[Mapping[str, Iterable]] = None,
+    ) -> np.ndarray:
+        """
+        Ascending positions satisfying every constraint.
+
+        Constraints on columns the index does not hold are ignored, the same
+        way the advisor skips filters on columns missing from the dataset.
+        """
+        selections = [
+            self.between(column, *bounds)
+            for column, bounds in (between or {}).items()
+            if column in self._sorted
+        ]
+        selections += [
+            self.isin(column, wanted)
+            for column, wanted in (isin or {}).items()
+            if column in self._postings
+        ]
+        if not selections:
+            return np.arange(self.size)
+
+        selections.sort(key=len)
+        result = selections[0]
+        for selection in selections[1:]:
+            result = np.intersect1d(result, selection, assume_unique=True)
+        return result